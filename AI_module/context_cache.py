@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+
+
+class ContextCache:
+    """
+    Provider-side context caches for system prompts.
+
+    Each distinct system prompt is registered once with caches.create and
+    later calls reference it by name (config.cached_content) instead of
+    re-sending it. Entries are refreshed with caches.update shortly before
+    they expire, so a topic that is in use never loses its cache.
+
+    Prompts the provider refuses to cache (e.g. below its minimum token
+    count) are remembered and not retried for retry_after seconds; callers
+    fall back to a plain system instruction.
+    """
+    def __init__(self, client, model: str, ttl_seconds: int = 3600, retry_after: int = 600):
+        self.client = client
+        self.model = model
+        self.ttl = ttl_seconds
+        # Refresh once less than this is left, so in-flight calls never hit an expired cache
+        self.refresh_margin = min(300, ttl_seconds / 4)
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        # key -> {"name": str | None, "expires_at": float}; name None marks a failed create
+        self._entries: dict[str, dict] = {}
+
+        self.created = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.hits = 0
+
+    @staticmethod
+    def key(system_prompt: str) -> str:
+        return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+    def lookup(self, system_prompt: str) -> tuple[str | None, bool]:
+        """(cache name, whether ensure() needs to run) - no network calls"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(self.key(system_prompt))
+            if entry is None:
+                return None, True
+            if entry["name"] is None:
+                return None, now >= entry["expires_at"]
+            if entry["expires_at"] - now > self.refresh_margin:
+                self.hits += 1
+                return entry["name"], False
+            return None, True
+
+    def ensure(self, system_prompt: str) -> str | None:
+        """Cache name for the prompt, creating or refreshing it if needed (blocking)"""
+        name, stale = self.lookup(system_prompt)
+        if not stale:
+            return name
+
+        key = self.key(system_prompt)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # One create/refresh per prompt at a time; later callers reuse its result
+        with key_lock:
+            name, stale = self.lookup(system_prompt)
+            if not stale:
+                return name
+
+            with self._lock:
+                entry = self._entries.get(key)
+
+            if entry is not None and entry["name"] is not None:
+                if self._refresh(key, entry["name"]):
+                    return entry["name"]
+
+            return self._create(key, system_prompt)
+
+    def forget(self, system_prompt: str):
+        """Drop an entry the provider no longer knows (expired or deleted upstream)"""
+        with self._lock:
+            self._entries.pop(self.key(system_prompt), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": sum(1 for entry in self._entries.values() if entry["name"]),
+                "hits": self.hits,
+                "created": self.created,
+                "refreshed": self.refreshed,
+                "failed": self.failed,
+                "ttl_seconds": self.ttl,
+            }
+
+    def _create(self, key: str, system_prompt: str) -> str | None:
+        try:
+            cached = self.client.caches.create(
+                model=self.model,
+                config={
+                    "system_instruction": system_prompt,
+                    "display_name": f"system-prompt-{key[:12]}",
+                    "ttl": f"{self.ttl}s",
+                },
+            )
+        except Exception as e:
+            print(f"[LLM] Context cache not created, using a system instruction: {str(e)[:200]}")
+            with self._lock:
+                self.failed += 1
+                self._entries[key] = {"name": None, "expires_at": time.monotonic() + self.retry_after}
+            return None
+
+        with self._lock:
+            self.created += 1
+            self._entries[key] = {"name": cached.name, "expires_at": time.monotonic() + self.ttl}
+        print(f"[LLM] Created context cache {cached.name}")
+        return cached.name
+
+    def _refresh(self, key: str, name: str) -> bool:
+        try:
+            self.client.caches.update(name=name, config={"ttl": f"{self.ttl}s"})
+        except Exception as e:
+            print(f"[LLM] Context cache {name} not refreshed, recreating: {str(e)[:200]}")
+            return False
+
+        with self._lock:
+            self.refreshed += 1
+            self._entries[key] = {"name": name, "expires_at": time.monotonic() + self.ttl}
+        return True
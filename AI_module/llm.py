@@ -1,40 +1,295 @@
-import os
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
-from google import genai
-
-load_dotenv()
-
-
-class LLM:
-    def __init__(
-        self,
-        model: str = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash-lite"),
-        temperature: float = os.environ.get("GEMINI_TEMPERATURE", 0.7),
-    ):
-        api_key = os.environ["GEMINI_API_KEY"]
-        if not api_key:
-            raise RuntimeError("GEMINI_API_KEY not found in environment")
-
-        self.client = genai.Client(api_key=api_key)
-        self.model = model
-        self.temperature = temperature
-
-    def generate(self, user_prompt: str, system_prompt: str | None = None) -> str:
-        if system_prompt:
-            prompt = f"{system_prompt}\n\nUser:\n{user_prompt}"
-        else:
-            prompt = user_prompt
-
-        response = self.client.models.generate_content(
-            model=self.model,
-            contents=prompt,
-            config={
-                "temperature": self.temperature,
-            },
-        )
-
-        return response.text.strip()
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+import httpx
+from google import genai
+from google.genai import errors, types
+from AI_module.context_cache import ContextCache
+
+load_dotenv()
+
+# Upstream statuses worth retrying: rate limited, overloaded or a gateway hiccup
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def _is_stale_context(cached_content: str | None, error: Exception) -> bool:
+    # The provider dropped the cache (expired or deleted) - resend the system prompt instead
+    return cached_content is not None and isinstance(error, errors.APIError) and error.code in (403, 404)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, (asyncio.TimeoutError, httpx.TransportError))
+
+
+class LLM:
+    def __init__(
+        self,
+        model: str = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash-lite"),
+        temperature: float = os.environ.get("GEMINI_TEMPERATURE", 0.7),
+    ):
+        api_key = os.environ["GEMINI_API_KEY"]
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY not found in environment")
+
+        # GEMINI_BASE_URL points the client at a local stub (scripts/stub_gemini.py)
+        self.timeout = float(os.environ.get("GEMINI_TIMEOUT", 30))
+        http_options = types.HttpOptions(
+            base_url=os.environ.get("GEMINI_BASE_URL") or None,
+            timeout=int(self.timeout * 1000),
+        )
+
+        # One client for the process - its HTTP connection pools are reused across requests
+        self.client = genai.Client(api_key=api_key, http_options=http_options)
+        self.model = model
+        self.temperature = temperature
+
+        # Async path: upstream concurrency cap, retries and hedging
+        self.max_in_flight = int(os.environ.get("GEMINI_MAX_IN_FLIGHT", 8))
+        self.retries = int(os.environ.get("GEMINI_RETRIES", 2))
+        self.backoff = float(os.environ.get("GEMINI_BACKOFF", 0.5))
+        self.hedge = os.environ.get("GEMINI_HEDGE", "0") == "1"
+        self.hedge_min_samples = int(os.environ.get("GEMINI_HEDGE_MIN_SAMPLES", 20))
+
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._latencies = deque(maxlen=200)
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+        # GEMINI_CONTEXT_CACHE=1 registers each system prompt once and references it by name
+        self.context_cache = None
+        if os.environ.get("GEMINI_CONTEXT_CACHE", "0") == "1":
+            self.context_cache = ContextCache(
+                self.client,
+                self.model,
+                ttl_seconds=int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL", 3600)),
+            )
+
+    def _build_contents(self, user_prompt: str, history: list[dict] | None):
+        """
+        The user turn, or with history ({"role": "user"|"model", "text"}
+        messages, oldest first) a multi-turn contents list ending in the new turn.
+        The system prompt is never part of the contents - see _config().
+        """
+        if not history:
+            return user_prompt
+
+        contents = [{"role": message["role"], "parts": [{"text": message["text"]}]} for message in history]
+        contents.append({"role": "user", "parts": [{"text": user_prompt}]})
+        return contents
+
+    def _config(self, system_prompt: str | None, cached_content: str | None) -> dict:
+        """Sampling config, with the system prompt as a system instruction or a cache reference"""
+        config = {
+            "temperature": self.temperature,
+        }
+        if cached_content:
+            config["cached_content"] = cached_content
+        elif system_prompt:
+            config["system_instruction"] = system_prompt
+        return config
+
+    def _context_for(self, system_prompt: str | None) -> str | None:
+        if self.context_cache is None or not system_prompt:
+            return None
+        return self.context_cache.ensure(system_prompt)
+
+    async def _acontext_for(self, system_prompt: str | None) -> str | None:
+        if self.context_cache is None or not system_prompt:
+            return None
+
+        name, stale = self.context_cache.lookup(system_prompt)
+        if not stale:
+            return name
+        # Creating or refreshing the cache is rare and blocking - keep it off the event loop
+        return await asyncio.to_thread(self.context_cache.ensure, system_prompt)
+
+    def _record_usage(self, response):
+        usage = response.usage_metadata
+        if usage is None:
+            return
+        with self._stats_lock:
+            self.prompt_tokens += usage.prompt_token_count or 0
+            self.cached_tokens += usage.cached_content_token_count or 0
+
+    def generate(self, user_prompt: str, system_prompt: str | None = None, history: list[dict] | None = None) -> str:
+        contents = self._build_contents(user_prompt, history)
+        cached_content = self._context_for(system_prompt)
+
+        try:
+            response = self.client.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=self._config(system_prompt, cached_content),
+            )
+        except errors.APIError as e:
+            if not _is_stale_context(cached_content, e):
+                raise
+            self.context_cache.forget(system_prompt)
+            response = self.client.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=self._config(system_prompt, None),
+            )
+
+        self._record_usage(response)
+        return response.text.strip()
+
+    def generate_stream(self, user_prompt: str, system_prompt: str | None = None, history: list[dict] | None = None):
+        """Yield text deltas as Gemini generates them"""
+        contents = self._build_contents(user_prompt, history)
+        cached_content = self._context_for(system_prompt)
+
+        try:
+            yield from self._stream(contents, self._config(system_prompt, cached_content))
+        except errors.APIError as e:
+            # A dropped cache fails the request before any text is produced
+            if not _is_stale_context(cached_content, e):
+                raise
+            self.context_cache.forget(system_prompt)
+            yield from self._stream(contents, self._config(system_prompt, None))
+
+    def _stream(self, contents, config: dict):
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model,
+            contents=contents,
+            config=config,
+        ):
+            if chunk.text:
+                yield chunk.text
+
+    def ping(self):
+        """Cheap reachability and credentials check - a model metadata lookup, no generation"""
+        self.client.models.get(model=self.model)
+
+    async def agenerate(self, user_prompt: str, system_prompt: str | None = None,
+                        history: list[dict] | None = None) -> str:
+        """
+        Async generate for async routes - never holds a threadpool slot.
+
+        At most GEMINI_MAX_IN_FLIGHT upstream calls run at once, each bounded
+        by GEMINI_TIMEOUT. Retryable failures (429/5xx, timeouts, connection
+        errors) are retried GEMINI_RETRIES times with jittered exponential
+        backoff. With GEMINI_HEDGE=1 a second request is started once the
+        first has run longer than the recent p95, and the first reply wins.
+        """
+        contents = self._build_contents(user_prompt, history)
+        cached_content = await self._acontext_for(system_prompt)
+        attempt = 0
+
+        while True:
+            try:
+                return await self._hedged_call(contents, self._config(system_prompt, cached_content))
+            except Exception as e:
+                if _is_stale_context(cached_content, e):
+                    self.context_cache.forget(system_prompt)
+                    cached_content = None
+                    continue
+                if attempt == self.retries or not _is_retryable(e):
+                    raise
+                delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+                attempt += 1
+                with self._stats_lock:
+                    self.retried += 1
+                print(f"[LLM] Retrying in {delay:.2f}s after: {str(e)[:120] or type(e).__name__}")
+                await asyncio.sleep(delay)
+
+    def p95_latency(self) -> float | None:
+        """p95 of recent successful upstream calls in seconds, None until enough samples"""
+        with self._stats_lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def stats(self) -> dict:
+        p95 = self.p95_latency()
+        with self._stats_lock:
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "retried": self.retried,
+                "timeouts": self.timeouts,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "context_cache": self.context_cache.stats() if self.context_cache else None,
+            }
+
+    async def _hedged_call(self, contents, config: dict) -> str:
+        delay = self.p95_latency() if self.hedge else None
+        tasks = [asyncio.create_task(self._call(contents, config))]
+
+        try:
+            if delay is None:
+                return await tasks[0]
+
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # Only hedge with spare capacity - queued hedges would just add load
+            if not done and not self._semaphore.locked():
+                # Slower than p95 - race a second request against it
+                with self._stats_lock:
+                    self.hedged += 1
+                tasks.append(asyncio.create_task(self._call(contents, config)))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            with self._stats_lock:
+                                self.hedge_wins += 1
+                        return task.result()
+
+            # Every request failed - surface the first one's error
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _call(self, contents, config: dict) -> str:
+        async with self._semaphore:
+            with self._stats_lock:
+                self.in_flight += 1
+            started = time.perf_counter()
+
+            try:
+                response = await asyncio.wait_for(
+                    self.client.aio.models.generate_content(
+                        model=self.model,
+                        contents=contents,
+                        config=config,
+                    ),
+                    timeout=self.timeout,
+                )
+            except asyncio.TimeoutError:
+                with self._stats_lock:
+                    self.timeouts += 1
+                raise
+            finally:
+                with self._stats_lock:
+                    self.in_flight -= 1
+
+            with self._stats_lock:
+                self._latencies.append(time.perf_counter() - started)
+            self._record_usage(response)
+            return response.text.strip()
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """
+    tiktoken's cl100k_base. Gemini's tokenizer differs a little, but the
+    budget only needs to be stable, not exact. tiktoken downloads the
+    vocabulary on first use, so an offline or missing install falls back
+    to ~4 characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    if tiktoken is None:
+                        raise ImportError("tiktoken is not installed")
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    print(f"[MEMORY] tiktoken unavailable, estimating tokens from length: {e}")
+                    _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Keep the last max_tokens tokens of text (the newest part of a summary)"""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[-max_tokens * 4:]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[-max_tokens:])
+
+
+SUMMARY_PROMPT = (
+    "Summarize this debate so far in a few short sentences. Keep each side's "
+    "main claims, the evidence used and any points conceded. Plain text only."
+)
+
+
+class Session:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.summary = ""
+        self.summary_tokens = 0
+        # (role, text, tokens), oldest first; role is "user" or "model"
+        self.turns = []
+        self.turn_tokens = 0
+        self.last_used = time.monotonic()
+        # Set while a summarize call runs for this session
+        self.folding = False
+
+
+class ConversationMemory:
+    """
+    Per-session debate history, assembled into the prompt under a token budget.
+
+    The newest turns are kept verbatim. Once they exceed the budget, the
+    oldest ones are folded into a rolling summary by `summarize` (a callable
+    taking the previous summary and the turns to fold, returning the new
+    summary). The summary is capped at summary_tokens, so the history sent
+    with each prompt never exceeds token_budget however long the debate runs.
+
+    Sessions idle for longer than ttl_seconds are dropped, and at most
+    max_sessions are kept (least recently used go first).
+    """
+    def __init__(self, summarize=None, token_budget: int = 2000, summary_tokens: int = 400,
+                 ttl_seconds: int = 3600, max_sessions: int = 1000):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.summary_tokens = min(summary_tokens, token_budget // 2)
+        self.ttl = ttl_seconds
+        self.max_sessions = max_sessions
+
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+
+        self.folds = 0
+
+    def history(self, session_id: str) -> list[dict]:
+        """Messages to send before the new user turn: summary first, then recent turns"""
+        session = self._get(session_id, create=False)
+        if session is None:
+            return []
+
+        with session.lock:
+            messages = []
+            if session.summary:
+                messages.append({"role": "user", "text": f"Summary of the debate so far:\n{session.summary}"})
+                messages.append({"role": "model", "text": "Understood, I'll continue from there."})
+            messages.extend({"role": role, "text": text} for role, text, _ in session.turns)
+            return messages
+
+    def record(self, session_id: str, user_text: str, model_text: str):
+        """Append one exchange and fold old turns into the summary if over budget"""
+        session = self._get(session_id, create=True)
+
+        with session.lock:
+            for role, text in (("user", user_text), ("model", model_text)):
+                tokens = count_tokens(text)
+                session.turns.append((role, text, tokens))
+                session.turn_tokens += tokens
+
+            previous_summary, folded = self._take_fold(session)
+
+        if folded:
+            self._fold(session, previous_summary, folded)
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "folds": self.folds,
+                "token_budget": self.token_budget,
+            }
+
+    def _take_fold(self, session: Session) -> tuple[str, list]:
+        """Pick the oldest turns to fold while over budget; call with session.lock held"""
+        turn_budget = self.token_budget - self.summary_tokens
+        if session.folding or session.turn_tokens <= turn_budget:
+            return session.summary, []
+
+        # Fold whole exchanges (user + model) so roles keep alternating
+        count, tokens = 0, session.turn_tokens
+        while tokens > turn_budget and len(session.turns) - count >= 2:
+            tokens -= session.turns[count][2] + session.turns[count + 1][2]
+            count += 2
+
+        session.folding = count > 0
+        return session.summary, session.turns[:count]
+
+    def _fold(self, session: Session, previous_summary: str, folded: list):
+        """
+        Summarize without holding session.lock, so history() never waits on
+        the LLM; until the new summary is swapped in it returns the old one
+        with the turns being folded still in place. Turns are only appended
+        meanwhile, so the folded ones are still the oldest.
+        """
+        summary = previous_summary
+        if self.summarize is not None:
+            try:
+                summary = self.summarize(previous_summary, [(role, text) for role, text, _ in folded])
+                summary = truncate_tokens(summary.strip(), self.summary_tokens)
+            except Exception as e:
+                # Budget still holds - the folded turns are just lost
+                print(f"[MEMORY] Summarization failed, dropping {len(folded)} turns: {e}")
+                summary = previous_summary
+        summary_tokens = count_tokens(summary) if summary else 0
+
+        with session.lock:
+            del session.turns[:len(folded)]
+            session.turn_tokens -= sum(tokens for _, _, tokens in folded)
+            session.summary = summary
+            session.summary_tokens = summary_tokens
+            session.folding = False
+        self.folds += 1
+
+    def _get(self, session_id: str, create: bool) -> Session | None:
+        now = time.monotonic()
+        with self._lock:
+            # Expire idle sessions, oldest first
+            while self._sessions:
+                oldest_id, oldest = next(iter(self._sessions.items()))
+                if now - oldest.last_used <= self.ttl:
+                    break
+                del self._sessions[oldest_id]
+
+            session = self._sessions.get(session_id)
+            if session is None:
+                if not create:
+                    return None
+                session = self._sessions[session_id] = Session()
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+
+def summarize_turns(llm, previous_summary: str, turns: list[tuple[str, str]]) -> str:
+    """Fold turns into the running summary with one LLM call"""
+    transcript = "\n".join(
+        f"{'User' if role == 'user' else 'AI'}: {text}" for role, text in turns
+    )
+    if previous_summary:
+        transcript = f"Earlier summary:\n{previous_summary}\n\nLater exchanges:\n{transcript}"
+    return llm.generate(user_prompt=transcript, system_prompt=SUMMARY_PROMPT)
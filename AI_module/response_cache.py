@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class ResponseCache:
+    """
+    TTL cache for completed LLM replies, with single-flight coalescing.
+
+    Keyed on model, temperature, the final system prompt and the normalized
+    user text. While a reply for a key is being generated, identical
+    requests wait for it instead of making their own upstream call.
+    Failures are passed to every waiter and never cached.
+
+    ttl_seconds = 0 turns off storing but keeps the coalescing.
+    """
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 1000):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, response), least recently used first
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._in_flight: dict[str, Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return re.sub(r'\s+', ' ', unicodedata.normalize("NFKC", text)).strip().casefold()
+
+    def key(self, model: str, temperature: float, system_prompt: str | None, user_prompt: str) -> str:
+        raw = f"{model}\0{temperature}\0{system_prompt or ''}\0{self.normalize(user_prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_or_generate(self, key: str, generate) -> str:
+        """Cached reply for key, else the result of generate() (run once per key at a time)"""
+        cached, pending, leader = self._claim(key)
+        if cached is not None:
+            return cached
+        if not leader:
+            return pending.result()
+
+        try:
+            response = generate()
+        except Exception as e:
+            self._fail(key, pending, e)
+            raise
+
+        self._complete(key, pending, response)
+        return response
+
+    async def aget_or_generate(self, key: str, agenerate) -> str:
+        """Async variant: agenerate is a coroutine function; waiters are shared with sync callers"""
+        cached, pending, leader = self._claim(key)
+        if cached is not None:
+            return cached
+        if not leader:
+            return await asyncio.wrap_future(pending)
+
+        try:
+            response = await agenerate()
+        except BaseException as e:
+            # Includes cancellation - waiters must not hang on an abandoned call
+            self._fail(key, pending, e if isinstance(e, Exception) else RuntimeError("Request cancelled"))
+            raise
+
+        self._complete(key, pending, response)
+        return response
+
+    def _claim(self, key: str) -> tuple[str | None, Future | None, bool]:
+        """(cached reply, in-flight future, whether this caller must generate)"""
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1], None, False
+                del self._entries[key]
+
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = self._in_flight[key] = Future()
+                self.misses += 1
+                return None, pending, True
+
+            self.coalesced += 1
+            return None, pending, False
+
+    def _fail(self, key: str, pending: Future, error: Exception):
+        with self._lock:
+            del self._in_flight[key]
+        pending.set_exception(error)
+
+    def _complete(self, key: str, pending: Future, response: str):
+        with self._lock:
+            del self._in_flight[key]
+            if self.ttl > 0 and response:
+                self._entries[key] = (time.monotonic() + self.ttl, response)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        pending.set_result(response)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+                "entries": len(self._entries),
+                "in_flight": len(self._in_flight),
+                "ttl_seconds": self.ttl,
+            }
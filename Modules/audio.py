@@ -0,0 +1,300 @@
+import io
+import shutil
+import subprocess
+import tempfile
+import uuid
+import wave
+from fractions import Fraction
+from pathlib import Path
+import numpy as np
+
+try:
+    import av  # PyAV - decodes uploads and encodes opus in-process, with ffmpeg's own libraries
+except ImportError:
+    av = None
+    print("[AUDIO] PyAV not installed - non-WAV uploads and opus replies will start an ffmpeg process")
+
+# Whisper expects 16 kHz mono float32 PCM
+SAMPLE_RATE = 16000
+
+
+# Output formats for synthesized speech: name -> (media type, file extension)
+OUTPUT_FORMATS = {
+    "wav": ("audio/wav", "wav"),
+    "opus": ("audio/ogg", "ogg"),
+}
+
+
+class AudioDecodeError(RuntimeError):
+    pass
+
+
+class AudioEncodeError(RuntimeError):
+    pass
+
+
+def decode_audio(data: bytes, sample_rate: int = SAMPLE_RATE, allow_partial: bool = False,
+                 temp_dir: Path | None = None) -> np.ndarray:
+    """
+    Decode an uploaded recording into the float32 mono array Whisper accepts.
+
+    Tried in order, cheapest first:
+      1. 16-bit PCM WAV at the target rate is parsed in-process
+      2. PyAV decodes everything else in-process, MP4/M4A included since
+         it reads from a seekable buffer - the normal path for browser
+         webm/opus uploads, with no process started per request
+      3. ffmpeg through stdin/stdout pipes - no files on disk
+      4. ffmpeg reading a temp file, for containers that need a seekable
+         input (e.g. MP4/M4A with the index at the end)
+    ffmpeg is only the fallback, for streams PyAV rejects or when it is
+    not installed.
+    """
+    if not data:
+        raise AudioDecodeError("Audio is empty")
+
+    if _is_wav(data):
+        audio = _decode_wav(data, sample_rate)
+        if audio is not None:
+            return audio
+
+    if av is not None:
+        try:
+            return _decode_with_av(data, sample_rate, allow_partial)
+        except Exception as e:
+            # A recording still in progress may not hold a whole frame yet
+            if not allow_partial:
+                print(f"[AUDIO] PyAV could not decode upload, falling back to ffmpeg: {e}")
+
+    if _needs_seekable_input(data):
+        return decode_audio_file_bytes(data, sample_rate, temp_dir)
+
+    try:
+        return decode_audio_bytes(data, sample_rate, allow_partial)
+    except AudioDecodeError:
+        if allow_partial:
+            raise
+        return decode_audio_file_bytes(data, sample_rate, temp_dir)
+
+
+def decode_audio_bytes(data: bytes, sample_rate: int = SAMPLE_RATE, allow_partial: bool = False) -> np.ndarray:
+    """
+    Decode an encoded recording (webm, ogg, wav, ...) into a float32 mono array
+    by piping it through ffmpeg. Nothing is written to disk.
+
+    With allow_partial=True a truncated stream (e.g. a recording that is still
+    in progress) returns whatever ffmpeg managed to decode instead of failing.
+    """
+    if not data:
+        raise AudioDecodeError("Audio is empty")
+
+    return _run_ffmpeg('pipe:0', sample_rate, data, allow_partial)
+
+
+def decode_audio_file_bytes(data: bytes, sample_rate: int = SAMPLE_RATE, temp_dir: Path | None = None) -> np.ndarray:
+    """Fallback: write the upload to a temp file so ffmpeg can seek in it"""
+    temp_dir = Path(temp_dir or tempfile.gettempdir())
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    path = temp_dir / f"{uuid.uuid4()}.upload"
+
+    try:
+        path.write_bytes(data)
+        return _run_ffmpeg(str(path), sample_rate)
+    finally:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _run_ffmpeg(source: str, sample_rate: int, data: bytes | None = None, allow_partial: bool = False) -> np.ndarray:
+    if shutil.which('ffmpeg') is None:
+        raise AudioDecodeError("ffmpeg is not installed")
+
+    result = subprocess.run([
+        'ffmpeg',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-i', source,
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate),
+        '-ac', '1',
+        'pipe:1'
+    ],
+    input=data,
+    capture_output=True
+    )
+
+    if result.returncode != 0 and not (allow_partial and result.stdout):
+        stderr = result.stderr.decode(errors="replace")
+        raise AudioDecodeError(f"Audio decoding failed: {stderr[:200]}")
+
+    if not result.stdout:
+        raise AudioDecodeError("Audio decoding produced no samples")
+
+    # Drop a trailing odd byte from a truncated stream
+    pcm = result.stdout[:len(result.stdout) - len(result.stdout) % 2]
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+def _is_wav(data: bytes) -> bool:
+    return data[:4] == b'RIFF' and data[8:12] == b'WAVE'
+
+
+def _needs_seekable_input(data: bytes) -> bool:
+    # ISO BMFF (mp4/m4a/mov) - the moov atom is often at the end of the file
+    return data[4:8] == b'ftyp'
+
+
+def _decode_wav(data: bytes, sample_rate: int) -> np.ndarray | None:
+    """Parse 16-bit PCM WAV at the target rate; anything else returns None"""
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as wav:
+            if wav.getsampwidth() != 2 or wav.getframerate() != sample_rate:
+                return None
+            channels = wav.getnchannels()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    samples = np.frombuffer(frames[:len(frames) - len(frames) % (2 * channels)], np.int16)
+    audio = samples.astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+
+    if audio.size == 0:
+        raise AudioDecodeError("Audio is empty")
+    return audio
+
+
+def _decode_with_av(data: bytes, sample_rate: int, allow_partial: bool) -> np.ndarray:
+    resampler = av.AudioResampler(format='s16', layout='mono', rate=sample_rate)
+    chunks = []
+
+    with av.open(io.BytesIO(data), mode='r') as container:
+        try:
+            for frame in container.decode(audio=0):
+                for out in resampler.resample(frame):
+                    chunks.append(out.to_ndarray().reshape(-1))
+            for out in resampler.resample(None):
+                chunks.append(out.to_ndarray().reshape(-1))
+        except av.error.FFmpegError:
+            # A recording still in progress ends mid-frame
+            if not (allow_partial and chunks):
+                raise
+
+    if not chunks:
+        raise AudioDecodeError("Audio decoding produced no samples")
+
+    return np.concatenate(chunks).astype(np.float32) / 32768.0
+
+
+def wav_duration(data: bytes) -> float:
+    """Length of a PCM WAV in seconds"""
+    with wave.open(io.BytesIO(data), 'rb') as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def encode_audio(wav_data: bytes, fmt: str = "wav", bitrate: str = "32k") -> bytes:
+    """
+    Re-encode a WAV for the wire. "wav" is returned as is; "opus" becomes
+    Opus-in-OGG, encoded in-process by PyAV (resampled to 48 kHz for
+    libopus), or piped through ffmpeg when PyAV is missing or fails.
+    Nothing is written to disk.
+    """
+    if fmt == "wav":
+        return wav_data
+    if fmt != "opus":
+        raise AudioEncodeError(f"Unsupported output format '{fmt}'")
+
+    if av is not None:
+        try:
+            return _encode_opus_with_av(wav_data, bitrate)
+        except Exception as e:
+            print(f"[AUDIO] PyAV could not encode opus, falling back to ffmpeg: {e}")
+
+    if shutil.which('ffmpeg') is None:
+        raise AudioEncodeError("ffmpeg is not installed")
+
+    result = subprocess.run([
+        'ffmpeg',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-f', 'wav',
+        '-i', 'pipe:0',
+        '-c:a', 'libopus',
+        '-b:a', bitrate,
+        '-application', 'voip',
+        '-f', 'ogg',
+        'pipe:1'
+    ],
+    input=wav_data,
+    capture_output=True
+    )
+
+    if result.returncode != 0 or not result.stdout:
+        stderr = result.stderr.decode(errors="replace")
+        raise AudioEncodeError(f"Audio encoding failed: {stderr[:200]}")
+
+    return result.stdout
+
+
+def _encode_opus_with_av(wav_data: bytes, bitrate: str) -> bytes:
+    try:
+        with wave.open(io.BytesIO(wav_data), 'rb') as wav:
+            if wav.getsampwidth() != 2:
+                raise AudioEncodeError("Only 16-bit PCM WAV can be encoded")
+            rate = wav.getframerate()
+            channels = wav.getnchannels()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise AudioEncodeError(f"Invalid WAV: {e}")
+
+    samples = np.frombuffer(frames[:len(frames) - len(frames) % (2 * channels)], np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if samples.size == 0:
+        raise AudioEncodeError("Audio is empty")
+
+    frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format='s16', layout='mono')
+    frame.sample_rate = rate
+    frame.pts = 0
+    frame.time_base = Fraction(1, rate)
+
+    output = io.BytesIO()
+    with av.open(output, mode='w', format='ogg') as container:
+        stream = container.add_stream('libopus', rate=48000, options={"application": "voip"})
+        stream.codec_context.layout = 'mono'
+        stream.codec_context.bit_rate = _parse_bitrate(bitrate)
+        # The codec context resamples to 48 kHz and cuts libopus-sized frames itself
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+
+    if not output.getbuffer().nbytes:
+        raise AudioEncodeError("Audio encoding produced no output")
+    return output.getvalue()
+
+
+def _parse_bitrate(bitrate: str) -> int:
+    """ffmpeg-style "32k" -> 32000"""
+    bitrate = bitrate.strip().lower()
+    if bitrate.endswith("k"):
+        return int(float(bitrate[:-1]) * 1000)
+    return int(bitrate)
+
+
+def float_to_wav_bytes(samples, sample_rate: int) -> bytes:
+    """Encode float samples in [-1, 1] as a 16-bit mono WAV, peak-normalized like Coqui's save_wav"""
+    audio = np.asarray(samples, dtype=np.float32)
+    peak = float(np.max(np.abs(audio))) if audio.size else 0.0
+    audio = audio * (32767 / max(0.01, peak))
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(audio.astype(np.int16).tobytes())
+    return buffer.getvalue()
@@ -0,0 +1,155 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+# How /ws/chat persists messages (CHAT_DURABILITY):
+#   buffered - broadcast at once; the message is committed within flush_ms
+#              (a crash loses at most the unflushed buffer)
+#   commit   - broadcast once the batch holding the message has committed
+#   direct   - one INSERT and commit per message, before the broadcast
+DURABILITY_MODES = ("buffered", "commit", "direct")
+
+_MESSAGE = "message"
+_FLUSH = "flush"
+_STOP = "stop"
+
+
+class ChatWriter:
+    """
+    Write-behind queue for chat messages.
+
+    Messages are accepted immediately and written by one background thread
+    with write_batch(rows), a single executemany transaction per batch. A
+    batch is written once flush_size rows are waiting or flush_ms after its
+    first row arrived, whichever comes first. Each row is
+    (topic_id, user_id, user_name, message, created_at), stamped when
+    submitted so the stored time does not depend on when it was flushed.
+
+    At most max_pending messages wait in memory; past that, submit() blocks
+    (asubmit() waits off the event loop) until the writer catches up.
+    flush() returns once everything submitted before it is committed.
+    """
+    def __init__(self, write_batch, flush_ms: float = 50, flush_size: int = 200,
+                 max_pending: int = 10000, retries: int = 3):
+        self.write_batch = write_batch
+        self.interval = flush_ms / 1000
+        self.flush_size = max(1, flush_size)
+        self.retries = retries
+
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        # Set once a full batch (or a flush/stop marker) is waiting
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, topic_id: str, user_id: str, user_name: str, message: str, block: bool = True) -> Future:
+        """Queue a message; the Future resolves once it is committed. Raises queue.Full if not block"""
+        self._ensure_started()
+        created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        future = Future()
+        self._queue.put((_MESSAGE, (topic_id, user_id, user_name, message, created_at), future), block=block)
+        if self._queue.qsize() >= self.flush_size:
+            self._wake.set()
+        return future
+
+    async def asubmit(self, topic_id: str, user_id: str, user_name: str, message: str) -> Future:
+        """submit() for coroutines - returns at once unless the queue is full"""
+        try:
+            return self.submit(topic_id, user_id, user_name, message, block=False)
+        except queue.Full:
+            # Backpressure: wait for room on a thread, keeping the event loop free
+            return await asyncio.to_thread(self.submit, topic_id, user_id, user_name, message)
+
+    def flush(self, timeout: float | None = None):
+        """Block until every message submitted before this call is committed (or failed)"""
+        if self._thread is None:
+            return
+        future = Future()
+        self._queue.put((_FLUSH, None, future))
+        self._wake.set()
+        future.result(timeout)
+
+    def close(self, timeout: float = 10):
+        """Write everything still queued and stop the writer thread"""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        future = Future()
+        self._queue.put((_STOP, None, future))
+        self._wake.set()
+        future.result(timeout)
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize(),
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else None,
+            "flush_ms": self.interval * 1000,
+            "flush_size": self.flush_size,
+        }
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="chat-writer", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            if batch[0][0] == _MESSAGE:
+                # Sleep through the window rather than waking for every message -
+                # each wake-up would take the GIL from the event loop
+                self._wake.wait(self.interval)
+            self._wake.clear()
+
+            # A flush or stop marker ends the batch early - everything before it is written now
+            while batch[-1][0] == _MESSAGE and len(batch) < self.flush_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if self._queue.qsize() >= self.flush_size:
+                # The next batch filled up meanwhile; its wake-up may have been cleared above
+                self._wake.set()
+
+            messages = [(row, future) for kind, row, future in batch if kind == _MESSAGE]
+            if messages:
+                self._write(messages)
+
+            kind, _, marker = batch[-1]
+            if kind != _MESSAGE:
+                marker.set_result(None)
+                if kind == _STOP:
+                    return
+
+    def _write(self, messages: list):
+        rows = [row for row, _ in messages]
+        for attempt in range(self.retries + 1):
+            try:
+                self.write_batch(rows)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    self.failed += len(rows)
+                    print(f"[CHAT] Dropped {len(rows)} messages after {attempt + 1} attempts: {e}")
+                    for _, future in messages:
+                        future.set_exception(e)
+                    return
+                time.sleep(0.1 * (attempt + 1))
+
+        self.batches += 1
+        self.written += len(rows)
+        for _, future in messages:
+            future.set_result(True)
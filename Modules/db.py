@@ -1,343 +1,547 @@
-import sqlite3
-import hashlib
-import secrets
-from pathlib import Path
-from datetime import datetime, timedelta
-
-DB_PATH = Path("data.db")
-
-def get_connection():
-    return sqlite3.connect(DB_PATH)
-
-def hash_password(password: str) -> str:
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(password: str, password_hash: str) -> bool:
-    """Verify password against hash"""
-    return hash_password(password) == password_hash
-
-def generate_token() -> str:
-    """Generate a secure random token"""
-    return secrets.token_urlsafe(32)
-
-def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Topics table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS topics (
-        id TEXT PRIMARY KEY,
-        title TEXT NOT NULL,
-        system_prompt TEXT NOT NULL
-    )
-    """)
-
-    # Users table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-    # Sessions table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS sessions (
-        token TEXT PRIMARY KEY,
-        user_id TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        expires_at TIMESTAMP NOT NULL,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    """)
-
-    # Chat messages table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS chat_messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        topic_id TEXT NOT NULL,
-        user_id TEXT NOT NULL,
-        user_name TEXT NOT NULL,
-        message TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (topic_id) REFERENCES topics (id),
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    """)
-
-    # Create index on email for faster lookups
-    cursor.execute("""
-    CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)
-    """)
-
-    # Create index on sessions for cleanup
-    cursor.execute("""
-    CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)
-    """)
-
-    # Create index on chat messages
-    cursor.execute("""
-    CREATE INDEX IF NOT EXISTS idx_chat_topic_time ON chat_messages(topic_id, created_at DESC)
-    """)
-
-    conn.commit()
-    conn.close()
-
-# Topic functions
-def get_topic_prompt(topic_id: str) -> str | None:
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT system_prompt FROM topics WHERE id = ?",
-        (topic_id,)
-    )
-
-    row = cursor.fetchone()
-    conn.close()
-
-    return row[0] if row else None
-
-def add_topic(topic_id: str, title: str, system_prompt: str) -> bool:
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    try:
-        cursor.execute(
-            "INSERT INTO topics (id, title, system_prompt) VALUES (?, ?, ?)",
-            (topic_id, title, system_prompt)
-        )
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
-
-def get_topic(topic_id: str) -> dict | None:
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT id, title, system_prompt FROM topics WHERE id = ?",
-        (topic_id,)
-    )
-
-    row = cursor.fetchone()
-    conn.close()
-
-    return {"id": row[0], "title": row[1], "system_prompt": row[2]} if row else None
-
-def get_all_topics() -> list[dict]:
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT id, title, system_prompt FROM topics")
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [{"id": row[0], "title": row[1], "system_prompt": row[2]} for row in rows]
-
-# User functions
-def create_user(name: str, email: str, password: str) -> dict | None:
-    """Create a new user"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    user_id = secrets.token_urlsafe(16)
-    password_hash = hash_password(password)
-
-    try:
-        cursor.execute(
-            "INSERT INTO users (id, name, email, password_hash) VALUES (?, ?, ?, ?)",
-            (user_id, name, email, password_hash)
-        )
-        conn.commit()
-        
-        return {
-            "id": user_id,
-            "name": name,
-            "email": email,
-            "password_hash": password_hash
-        }
-    except sqlite3.IntegrityError:
-        return None
-    finally:
-        conn.close()
-
-def get_user_by_email(email: str) -> dict | None:
-    """Get user by email"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT id, name, email, password_hash, created_at FROM users WHERE email = ?",
-        (email,)
-    )
-
-    row = cursor.fetchone()
-    conn.close()
-
-    if row:
-        return {
-            "id": row[0],
-            "name": row[1],
-            "email": row[2],
-            "password_hash": row[3],
-            "created_at": row[4]
-        }
-    return None
-
-def get_user_by_id(user_id: str) -> dict | None:
-    """Get user by ID"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT id, name, email, created_at FROM users WHERE id = ?",
-        (user_id,)
-    )
-
-    row = cursor.fetchone()
-    conn.close()
-
-    if row:
-        return {
-            "id": row[0],
-            "name": row[1],
-            "email": row[2],
-            "created_at": row[3]
-        }
-    return None
-
-# Session functions
-def create_session(user_id: str, expires_in_days: int = 30) -> str:
-    """Create a new session for user"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    token = generate_token()
-    expires_at = datetime.now() + timedelta(days=expires_in_days)
-
-    cursor.execute(
-        "INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)",
-        (token, user_id, expires_at.isoformat())
-    )
-    conn.commit()
-    conn.close()
-
-    return token
-
-def get_session(token: str) -> dict | None:
-    """Get session and user info by token"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Clean up expired sessions first
-    cursor.execute(
-        "DELETE FROM sessions WHERE expires_at < ?",
-        (datetime.now().isoformat(),)
-    )
-
-    # Get session with user info
-    cursor.execute("""
-        SELECT s.token, s.user_id, s.expires_at, u.name, u.email
-        FROM sessions s
-        JOIN users u ON s.user_id = u.id
-        WHERE s.token = ? AND s.expires_at > ?
-    """, (token, datetime.now().isoformat()))
-
-    row = cursor.fetchone()
-    conn.commit()
-    conn.close()
-
-    if row:
-        return {
-            "session_token": row[0],
-            "user_id": row[1],
-            "expires_at": row[2],
-            "name": row[3],
-            "email": row[4]
-        }
-    return None
-
-def delete_session(token: str) -> bool:
-    """Delete a session (logout)"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("DELETE FROM sessions WHERE token = ?", (token,))
-    deleted = cursor.rowcount > 0
-    
-    conn.commit()
-    conn.close()
-
-    return deleted
-
-def cleanup_expired_sessions():
-    """Clean up all expired sessions"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "DELETE FROM sessions WHERE expires_at < ?",
-        (datetime.now().isoformat(),)
-    )
-    deleted = cursor.rowcount
-    
-    conn.commit()
-    conn.close()
-
-    return deleted
-
-# Chat message functions
-def save_chat_message(topic_id: str, user_id: str, user_name: str, message: str) -> bool:
-    """Save a chat message"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    try:
-        cursor.execute(
-            "INSERT INTO chat_messages (topic_id, user_id, user_name, message) VALUES (?, ?, ?, ?)",
-            (topic_id, user_id, user_name, message)
-        )
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Failed to save message: {e}")
-        return False
-    finally:
-        conn.close()
-
-def get_chat_messages(topic_id: str, limit: int = 50) -> list[dict]:
-    """Get recent chat messages for a topic"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT user_id, user_name, message, created_at
-        FROM chat_messages
-        WHERE topic_id = ?
-        ORDER BY created_at DESC
-        LIMIT ?
-    """, (topic_id, limit))
-
-    rows = cursor.fetchall()
-    conn.close()
-
-    # Reverse to get chronological order
-    messages = []
-    for row in reversed(rows):
-        messages.append({
-            "user_id": row[0],
-            "user_name": row[1],
-            "message": row[2],
-            "timestamp": row[3]
-        })
-    
-    return messages
\ No newline at end of file
+import os
+import sqlite3
+import hashlib
+import secrets
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from Modules.metrics import registry, track_calls
+from Modules.session_cache import SessionCache
+
+DB_PATH = Path(os.environ.get("DB_PATH", "data.db"))
+
+# Connections are opened once per thread and reused; DB_POOL=0 opens one per
+# call instead, without the pragmas below (the old behaviour, for scripts/bench_db.py)
+POOL_CONNECTIONS = os.environ.get("DB_POOL", "1") == "1"
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))
+CACHE_MB = int(os.environ.get("DB_CACHE_MB", 16))
+MMAP_MB = int(os.environ.get("DB_MMAP_MB", 128))
+STATEMENT_CACHE_SIZE = 128
+# Most chat messages one page may hold, whatever limit is asked for
+CHAT_PAGE_MAX = 100
+
+# Auth checks are answered from memory; logout invalidates at once
+session_cache = SessionCache(
+    ttl_seconds=float(os.environ.get("SESSION_CACHE_TTL", 60)),
+    max_entries=int(os.environ.get("SESSION_CACHE_SIZE", 10000)),
+)
+
+DB_CALLS = registry.counter("db_calls_total", "Calls per Modules.db function", ("function",))
+DB_SECONDS = registry.counter("db_call_seconds_total", "Seconds spent per Modules.db function", ("function",))
+timed = track_calls(DB_CALLS, DB_SECONDS)
+
+_local = threading.local()
+# Thread -> its connection, so connections of finished threads can be closed
+_connections = {}
+_connections_lock = threading.Lock()
+# Bumped by close_connections(); a thread holding an older connection reopens
+_generation = 0
+
+def _open_connection() -> sqlite3.Connection:
+    # check_same_thread=False only so a connection can be closed from another
+    # thread (shutdown, pruning); otherwise each is used by its own thread
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    # WAL lets readers run alongside a writer; it is stored in the file, so this is a no-op after the first time
+    conn.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL only risks the last transactions on power loss, never corruption
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_MB * 1024}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_MB * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+def _close(conn: sqlite3.Connection):
+    try:
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"[DB] Failed to close connection: {e}")
+
+def get_connection() -> sqlite3.Connection:
+    """This thread's connection; hand it back with release_connection() instead of closing it"""
+    if not POOL_CONNECTIONS:
+        return sqlite3.connect(DB_PATH)
+
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.generation == _generation:
+        if conn.in_transaction:
+            # Left open by a call that raised before committing
+            conn.rollback()
+        return conn
+
+    conn = _open_connection()
+    with _connections_lock:
+        finished = [thread for thread in _connections if not thread.is_alive()]
+        for thread in finished:
+            _close(_connections.pop(thread))
+        _connections[threading.current_thread()] = conn
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+def release_connection(conn: sqlite3.Connection):
+    """End a call: roll back anything uncommitted and keep the connection for the next call"""
+    if not POOL_CONNECTIONS:
+        conn.close()
+        return
+
+    if conn.in_transaction:
+        conn.rollback()
+
+def close_connections():
+    """Close every pooled connection (at shutdown); threads open a new one on their next call"""
+    global _generation
+    with _connections_lock:
+        connections = list(_connections.values())
+        _connections.clear()
+        _generation += 1
+
+    for conn in connections:
+        _close(conn)
+
+def hash_password(password: str) -> str:
+    """Hash password using SHA-256"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """Verify password against hash"""
+    return hash_password(password) == password_hash
+
+def generate_token() -> str:
+    """Generate a secure random token"""
+    return secrets.token_urlsafe(32)
+
+@timed
+def init_db():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # Topics table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS topics (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        system_prompt TEXT NOT NULL
+    )
+    """)
+
+    # Users table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Sessions table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS sessions (
+        token TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """)
+
+    # Chat messages table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        topic_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        user_name TEXT NOT NULL,
+        message TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (topic_id) REFERENCES topics (id),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """)
+
+    # Create index on email for faster lookups
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)
+    """)
+
+    # Create index on sessions for cleanup
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)
+    """)
+
+    # Chat pages are ranges of (topic_id, id); the older created_at index is no longer read.
+    # Not covering - each row found is then read from the table by rowid (id)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_chat_topic_id ON chat_messages(topic_id, id)
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_chat_topic_time")
+
+    # Migration: per-topic switch for the LLM response cache
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(topics)")}
+    if "cache_enabled" not in columns:
+        cursor.execute("ALTER TABLE topics ADD COLUMN cache_enabled INTEGER NOT NULL DEFAULT 1")
+
+    conn.commit()
+    release_connection(conn)
+
+# Topic functions
+@timed
+def get_topic_prompt(topic_id: str) -> str | None:
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT system_prompt FROM topics WHERE id = ?",
+        (topic_id,)
+    )
+
+    row = cursor.fetchone()
+    release_connection(conn)
+
+    return row[0] if row else None
+
+@timed
+def add_topic(topic_id: str, title: str, system_prompt: str) -> bool:
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "INSERT INTO topics (id, title, system_prompt) VALUES (?, ?, ?)",
+            (topic_id, title, system_prompt)
+        )
+        conn.commit()
+        return True
+    except sqlite3.IntegrityError:
+        return False
+    finally:
+        release_connection(conn)
+
+@timed
+def add_topics(topics: list[tuple[str, str, str]]) -> int:
+    """Insert (id, title, system_prompt) rows in one transaction, skipping existing ids"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.executemany(
+        "INSERT OR IGNORE INTO topics (id, title, system_prompt) VALUES (?, ?, ?)",
+        topics
+    )
+    added = cursor.rowcount
+    conn.commit()
+    release_connection(conn)
+
+    return added
+
+@timed
+def get_topic(topic_id: str) -> dict | None:
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT id, title, system_prompt, cache_enabled FROM topics WHERE id = ?",
+        (topic_id,)
+    )
+
+    row = cursor.fetchone()
+    release_connection(conn)
+
+    return {"id": row[0], "title": row[1], "system_prompt": row[2], "cache_enabled": bool(row[3])} if row else None
+
+@timed
+def get_all_topics() -> list[dict]:
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, title, system_prompt, cache_enabled FROM topics")
+    rows = cursor.fetchall()
+    release_connection(conn)
+
+    return [
+        {"id": row[0], "title": row[1], "system_prompt": row[2], "cache_enabled": bool(row[3])}
+        for row in rows
+    ]
+
+@timed
+def set_topic_cache_enabled(topic_id: str, enabled: bool) -> bool:
+    """Turn LLM response caching on or off for one topic"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "UPDATE topics SET cache_enabled = ? WHERE id = ?",
+        (int(enabled), topic_id)
+    )
+    updated = cursor.rowcount > 0
+    conn.commit()
+    release_connection(conn)
+
+    return updated
+
+# User functions
+@timed
+def create_user(name: str, email: str, password: str) -> dict | None:
+    """Create a new user"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    user_id = secrets.token_urlsafe(16)
+    password_hash = hash_password(password)
+
+    try:
+        cursor.execute(
+            "INSERT INTO users (id, name, email, password_hash) VALUES (?, ?, ?, ?)",
+            (user_id, name, email, password_hash)
+        )
+        conn.commit()
+        
+        return {
+            "id": user_id,
+            "name": name,
+            "email": email,
+            "password_hash": password_hash
+        }
+    except sqlite3.IntegrityError:
+        return None
+    finally:
+        release_connection(conn)
+
+@timed
+def get_user_by_email(email: str) -> dict | None:
+    """Get user by email"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT id, name, email, password_hash, created_at FROM users WHERE email = ?",
+        (email,)
+    )
+
+    row = cursor.fetchone()
+    release_connection(conn)
+
+    if row:
+        return {
+            "id": row[0],
+            "name": row[1],
+            "email": row[2],
+            "password_hash": row[3],
+            "created_at": row[4]
+        }
+    return None
+
+@timed
+def get_user_by_id(user_id: str) -> dict | None:
+    """Get user by ID"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT id, name, email, created_at FROM users WHERE id = ?",
+        (user_id,)
+    )
+
+    row = cursor.fetchone()
+    release_connection(conn)
+
+    if row:
+        return {
+            "id": row[0],
+            "name": row[1],
+            "email": row[2],
+            "created_at": row[3]
+        }
+    return None
+
+# Session functions
+@timed
+def create_session(user_id: str, expires_in_days: int = 30) -> str:
+    """Create a new session for user"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    token = generate_token()
+    expires_at = datetime.now() + timedelta(days=expires_in_days)
+
+    cursor.execute(
+        "INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)",
+        (token, user_id, expires_at.isoformat())
+    )
+    conn.commit()
+    release_connection(conn)
+
+    return token
+
+@timed
+def get_session(token: str) -> dict | None:
+    """Get session and user info by token - read-only; expired rows are removed by cleanup_expired_sessions"""
+    session = session_cache.get(token)
+    if session is not None:
+        return session
+
+    stamp = session_cache.stamp()
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # Get session with user info
+    cursor.execute("""
+        SELECT s.token, s.user_id, s.expires_at, u.name, u.email
+        FROM sessions s
+        JOIN users u ON s.user_id = u.id
+        WHERE s.token = ? AND s.expires_at > ?
+    """, (token, datetime.now().isoformat()))
+
+    row = cursor.fetchone()
+    release_connection(conn)
+
+    if row:
+        session = {
+            "session_token": row[0],
+            "user_id": row[1],
+            "expires_at": row[2],
+            "name": row[3],
+            "email": row[4]
+        }
+        session_cache.put(token, session, stamp)
+        return session
+    return None
+
+@timed
+def delete_session(token: str) -> bool:
+    """Delete a session (logout)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM sessions WHERE token = ?", (token,))
+    deleted = cursor.rowcount > 0
+    
+    conn.commit()
+    release_connection(conn)
+    # After the commit, so a lookup that read the row just before cannot cache it again
+    session_cache.invalidate(token)
+
+    return deleted
+
+@timed
+def cleanup_expired_sessions():
+    """Clean up all expired sessions"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "DELETE FROM sessions WHERE expires_at < ?",
+        (datetime.now().isoformat(),)
+    )
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    release_connection(conn)
+
+    return deleted
+
+# Chat message functions
+@timed
+def save_chat_message(topic_id: str, user_id: str, user_name: str, message: str) -> bool:
+    """Save a chat message"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "INSERT INTO chat_messages (topic_id, user_id, user_name, message) VALUES (?, ?, ?, ?)",
+            (topic_id, user_id, user_name, message)
+        )
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Failed to save message: {e}")
+        return False
+    finally:
+        release_connection(conn)
+
+@timed
+def save_chat_messages(rows: list[tuple[str, str, str, str, str]]) -> int:
+    """Insert (topic_id, user_id, user_name, message, created_at) rows in one transaction"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.executemany(
+            "INSERT INTO chat_messages (topic_id, user_id, user_name, message, created_at) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+        return len(rows)
+    finally:
+        release_connection(conn)
+
+@timed
+def get_chat_page(topic_id: str, limit: int = 50, before_id: int | None = None, after_id: int | None = None) -> dict:
+    """
+    One page of a topic's chat in chronological order, keyed on message id.
+
+    Without a cursor: the newest messages. before_id: the messages just
+    older than that id (scrolling back); after_id: those just newer. Every
+    page is one range scan of the (topic_id, id) index plus a rowid lookup
+    per returned row, so it costs the same however deep it is.
+    next_cursor is the id to pass as the same parameter for the following
+    page, or None once there is nothing more in that direction.
+    """
+    if before_id is not None and after_id is not None:
+        raise ValueError("Pass before_id or after_id, not both")
+    limit = max(1, min(limit, CHAT_PAGE_MAX))
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    if after_id is not None:
+        condition, order, params = "AND id > ?", "ASC", (topic_id, after_id)
+    elif before_id is not None:
+        condition, order, params = "AND id < ?", "DESC", (topic_id, before_id)
+    else:
+        condition, order, params = "", "DESC", (topic_id,)
+
+    # One extra row tells whether another page follows
+    cursor.execute(f"""
+        SELECT id, user_id, user_name, message, created_at
+        FROM chat_messages
+        WHERE topic_id = ? {condition}
+        ORDER BY id {order}
+        LIMIT ?
+    """, params + (limit + 1,))
+
+    rows = cursor.fetchall()
+    release_connection(conn)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after_id is None:
+        # Fetched newest first - reverse to get chronological order
+        rows.reverse()
+
+    messages = []
+    for row in rows:
+        messages.append({
+            "id": row[0],
+            "user_id": row[1],
+            "user_name": row[2],
+            "message": row[3],
+            "timestamp": row[4]
+        })
+
+    next_cursor = None
+    if has_more:
+        next_cursor = messages[-1]["id"] if after_id is not None else messages[0]["id"]
+
+    return {"messages": messages, "next_cursor": next_cursor}
+
+def get_chat_messages(topic_id: str, limit: int = 50) -> list[dict]:
+    """Get recent chat messages for a topic (counted in the metrics as get_chat_page)"""
+    return get_chat_page(topic_id, limit)["messages"]
@@ -0,0 +1,39 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from Modules import db
+
+# Coroutines (WebSocket handlers, async routes) reach Modules.db through a
+# small dedicated thread pool, so a slow query, a lock wait or an fsync never
+# blocks the event loop. It is separate from the threadpool serving sync
+# routes, which keep calling Modules.db directly, and its size caps the
+# number of SQLite connections these calls hold (one per thread).
+DB_THREADS = int(os.environ.get("DB_THREADS", 4))
+
+_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
+
+async def run(func, *args, **kwargs):
+    """Run blocking database work on the database threads"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def _async(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+
+get_topic = _async(db.get_topic)
+get_session = _async(db.get_session)
+save_chat_message = _async(db.save_chat_message)
+
+
+def shutdown():
+    """Finish queued calls and stop the threads; call before db.close_connections()"""
+    global _executor
+    executor, _executor = _executor, ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+    executor.shutdown(wait=True)
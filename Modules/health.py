@@ -0,0 +1,104 @@
+import threading
+import time
+
+
+class ProbeDegraded(Exception):
+    """Raised by a probe whose component works but is impaired, e.g. saturated"""
+    pass
+
+
+class HealthProber:
+    """
+    Runs component health probes on a background schedule and keeps the
+    last result of each, so health endpoints answer instantly without
+    touching the components themselves.
+
+    A probe is a callable that raises on failure; whatever it returns is
+    attached to the result as "detail". Each probe gets its own thread, so a
+    slow or hung probe never delays the others - its result just ages, and
+    a result older than 3 intervals is reported as stale.
+
+    Critical probes failing make the overall status "unhealthy", others only
+    "degraded". A probe raising ProbeDegraded is "degraded" even if critical.
+    """
+    def __init__(self):
+        self._probes = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def add(self, name: str, probe, interval: float, critical: bool = True):
+        self._probes[name] = {"probe": probe, "interval": interval, "critical": critical}
+
+    def start(self):
+        if self._threads:
+            return
+
+        self._stop.clear()
+        for name in self._probes:
+            thread = threading.Thread(target=self._run, args=(name,), name=f"health-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._threads = []
+
+    def run_once(self, name: str):
+        """Run one probe now and record its result"""
+        probe = self._probes[name]
+        started = time.perf_counter()
+
+        try:
+            detail = probe["probe"]()
+            result = {"status": "ok"}
+            if detail is not None:
+                result["detail"] = detail
+        except ProbeDegraded as e:
+            result = {"status": "degraded", "error": str(e)[:300]}
+        except Exception as e:
+            result = {"status": "error", "error": str(e)[:300]}
+
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["checked_at"] = time.time()
+
+        with self._lock:
+            self._results[name] = result
+
+    def snapshot(self) -> dict:
+        """Last result of every probe with its age; never runs a probe"""
+        now = time.time()
+        status = "healthy"
+        components = {}
+
+        with self._lock:
+            results = dict(self._results)
+
+        for name, probe in self._probes.items():
+            result = results.get(name)
+            if result is None:
+                components[name] = {"status": "pending"}
+                if status == "healthy":
+                    status = "starting"
+                continue
+
+            component = dict(result)
+            component["age_seconds"] = round(now - result["checked_at"], 1)
+            if component["age_seconds"] > 3 * probe["interval"] and component["status"] == "ok":
+                component["status"] = "stale"
+            components[name] = component
+
+            if component["status"] != "ok":
+                if probe["critical"] and component["status"] != "degraded":
+                    status = "unhealthy"
+                elif status != "unhealthy":
+                    status = "degraded"
+
+        return {"status": status, "components": components}
+
+    def _run(self, name: str):
+        interval = self._probes[name]["interval"]
+        while not self._stop.is_set():
+            self.run_once(name)
+            self._stop.wait(interval)
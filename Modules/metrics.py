@@ -0,0 +1,262 @@
+import bisect
+import functools
+import math
+import threading
+import time
+
+# Buckets shared by the latency histograms, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Audio payload sizes, in bytes
+SIZE_BUCKETS = (4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Child metric for one set of label values; keep a reference to it on hot paths"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_label_text(self.label_names, values)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    """
+    A settable value, or with set_function() one computed only when scraped
+    (the function returns a number, or {label values tuple: number})
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        super().__init__(name, help_text, labels)
+        self._function = None
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set_function(self, function):
+        self._function = function
+
+    def render(self) -> list[str]:
+        if self._function is None:
+            return super().render()
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            result = self._function()
+        except Exception as e:
+            return lines + [f"# {self.name} unavailable: {_escape(e)}"]
+
+        items = result.items() if isinstance(result, dict) else [((), result)]
+        for values, value in sorted(items):
+            lines.append(f"{self.name}{_label_text(self.label_names, values)} {_format_value(value)}")
+        return lines
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    """Context manager observing the elapsed seconds"""
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram. observe() is a bisect and two additions; the
+    cumulative bucket counts are only built when scraped.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, values, child):
+        with child.lock:
+            counts = list(child.counts)
+            total_sum = child.sum
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_label_text(self.label_names, values, le)} {cumulative}")
+        labels = _label_text(self.label_names, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry scraped by /metrics
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def track_calls(calls: Counter, seconds: Counter):
+    """
+    Decorator counting calls and total seconds per function name, for
+    per-function latency (rate(seconds) / rate(calls)) at two additions a call
+    """
+    def decorator(func):
+        call_count = calls.labels(func.__name__)
+        call_seconds = seconds.labels(func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                call_seconds.inc(time.perf_counter() - started)
+                call_count.inc()
+        return wrapper
+    return decorator
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+class SessionCache:
+    """
+    Bounded cache of token -> session rows in front of the sessions table.
+
+    An entry is served until the earlier of ttl_seconds after it was cached
+    and the session's own expires_at, so an expired session is never
+    accepted. invalidate() drops a token at once (logout). The TTL bounds
+    how long a session deleted some other way - another process, a manual
+    DELETE - can still be accepted here.
+
+    Lookups racing an invalidate() cannot re-insert the token: put() takes
+    the stamp() read before the database query and is ignored if anything
+    was invalidated since.
+    """
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 10000):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        # token -> (valid_until as time.time(), session), least recently used first
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._invalidations = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return dict(entry[1])
+
+    def stamp(self) -> int:
+        with self._lock:
+            return self._invalidations
+
+    def put(self, token: str, session: dict, stamp: int):
+        if self.ttl <= 0:
+            return
+
+        valid_until = min(time.time() + self.ttl, datetime.fromisoformat(session["expires_at"]).timestamp())
+        with self._lock:
+            if stamp != self._invalidations:
+                return
+            self._entries[token] = (valid_until, dict(session))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.pop(token, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl,
+            }
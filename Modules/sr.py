@@ -1,22 +1,309 @@
-import whisper
-from pathlib import Path
-
-_model_cache = {}
-class SpeechRecognizer:
-    def __init__(self, model_size: str = "base"):
-        if model_size not in _model_cache:
-            _model_cache[model_size] = whisper.load_model(model_size)
-        self.model = _model_cache[model_size]
-
-    def transcribe(self, audio_path: str) -> dict:
-        audio_file = Path(audio_path)
-
-        if not audio_file.exists():
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
-
-        result = self.model.transcribe(str(audio_file))
-
-        return {
-            "text": result["text"].strip(),
-            "language": result.get("language"),
-        }
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from pathlib import Path
+from Modules.audio import SAMPLE_RATE, decode_audio
+
+# Whisper sees at most 30 s of audio per decoding window
+WINDOW_SAMPLES = 30 * SAMPLE_RATE
+
+# Whisper's own retry schedule when a decode looks like a hallucination
+FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+def transcribe_options(language: str | None = None, beam_size: int | None = None,
+                       temperature_fallback: bool = True, fp16: bool = False,
+                       initial_prompt: str | None = None) -> dict:
+    """
+    Decode options shared by every backend.
+
+    language=None auto-detects per clip; pinning it skips detection.
+    beam_size=None decodes greedily. temperature_fallback re-decodes at
+    rising temperatures when the output looks degenerate. fp16 only takes
+    effect on CUDA. initial_prompt biases the vocabulary toward domain terms.
+    """
+    if language is not None:
+        language = language.strip().lower() or None
+        if language is not None and not language.isalpha():
+            raise ValueError(f"Invalid language code '{language}'")
+
+    if beam_size is not None and beam_size < 1:
+        beam_size = None
+
+    return {
+        "language": language,
+        "beam_size": beam_size,
+        "temperature_fallback": bool(temperature_fallback),
+        "fp16": bool(fp16),
+        "initial_prompt": initial_prompt or None,
+    }
+
+
+def _needs_fallback(decoded) -> bool:
+    # Same thresholds as whisper.transcribe's defaults
+    return decoded.compression_ratio > 2.4 or decoded.avg_logprob < -1.0
+
+
+class WhisperBackend:
+    """Stock openai-whisper, fp32 on CPU"""
+    def __init__(self, model_size: str):
+        # Imported here so the server process can use the batcher without loading torch
+        import whisper
+
+        self.model = whisper.load_model(model_size)
+
+    def _fp16(self, options: dict) -> bool:
+        # fp16 on CPU only produces a warning and falls back to fp32
+        return options["fp16"] and self.model.device.type == "cuda"
+
+    def transcribe(self, audio: str | np.ndarray, options: dict) -> dict:
+        result = self.model.transcribe(
+            audio,
+            language=options["language"],
+            beam_size=options["beam_size"],
+            temperature=FALLBACK_TEMPERATURES if options["temperature_fallback"] else 0.0,
+            fp16=self._fp16(options),
+            initial_prompt=options["initial_prompt"],
+        )
+        return {
+            "text": result["text"].strip(),
+            "language": result.get("language"),
+        }
+
+    def transcribe_batch(self, audios: list[np.ndarray], options: dict) -> list[dict]:
+        """
+        One batched encoder and decoder pass over several clips.
+        Clips longer than one 30 s window don't fit a single pass, and with
+        temperature_fallback on, clips whose batched decode looks degenerate
+        are redone through transcribe() one by one.
+        """
+        import torch
+        import whisper
+
+        results = [None] * len(audios)
+        batched = []
+
+        for index, audio in enumerate(audios):
+            if len(audio) > WINDOW_SAMPLES:
+                results[index] = self.transcribe(audio, options)
+            else:
+                batched.append(index)
+
+        if batched:
+            # Pad every clip to the 30 s window so they stack into one tensor
+            mels = torch.stack([
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(audios[index]),
+                    n_mels=self.model.dims.n_mels,
+                )
+                for index in batched
+            ]).to(self.model.device)
+
+            # language=None detects the language per clip
+            decoding = whisper.DecodingOptions(
+                language=options["language"],
+                beam_size=options["beam_size"],
+                prompt=options["initial_prompt"],
+                fp16=self._fp16(options),
+            )
+            for index, decoded in zip(batched, whisper.decode(self.model, mels, decoding)):
+                if options["temperature_fallback"] and _needs_fallback(decoded):
+                    results[index] = self.transcribe(audios[index], options)
+                    continue
+                results[index] = {
+                    "text": decoded.text.strip(),
+                    "language": decoded.language,
+                }
+
+        return results
+
+
+class FasterWhisperBackend:
+    """CTranslate2 Whisper (faster-whisper) with int8-quantized weights on CPU"""
+    def __init__(self, model_size: str):
+        from faster_whisper import WhisperModel
+
+        compute_type = os.environ.get("STT_COMPUTE_TYPE", "int8")
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type)
+
+    def transcribe(self, audio: str | np.ndarray, options: dict) -> dict:
+        # fp16 is decided by STT_COMPUTE_TYPE for this engine
+        segments, info = self.model.transcribe(
+            audio,
+            language=options["language"],
+            beam_size=options["beam_size"] or 1,
+            temperature=list(FALLBACK_TEMPERATURES) if options["temperature_fallback"] else 0.0,
+            initial_prompt=options["initial_prompt"],
+        )
+        # segments is a generator - decoding happens while it is consumed
+        text = "".join(segment.text for segment in segments)
+        return {
+            "text": text.strip(),
+            "language": info.language,
+        }
+
+    def transcribe_batch(self, audios: list[np.ndarray], options: dict) -> list[dict]:
+        return [self.transcribe(audio, options) for audio in audios]
+
+
+BACKENDS = {
+    "whisper": WhisperBackend,
+    "faster-whisper": FasterWhisperBackend,
+}
+
+_model_cache = {}
+class SpeechRecognizer:
+    """
+    Speech to text behind one transcribe() contract. The engine is picked with
+    backend= or the STT_BACKEND environment variable ("whisper" by default,
+    "faster-whisper" for the int8 CPU engine).
+    """
+    def __init__(self, model_size: str = "base", backend: str | None = None):
+        backend = backend or os.environ.get("STT_BACKEND", "whisper")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown STT backend '{backend}', expected one of {sorted(BACKENDS)}")
+
+        key = (backend, model_size)
+        if key not in _model_cache:
+            _model_cache[key] = BACKENDS[backend](model_size)
+        self.backend_name = backend
+        self.backend = _model_cache[key]
+        self.model = self.backend.model
+
+    def transcribe(self, audio: str | bytes | np.ndarray, options: dict | None = None) -> dict:
+        """Transcribe a file path, encoded audio bytes or a 16 kHz mono float32 array"""
+        options = options or transcribe_options()
+
+        if isinstance(audio, (bytes, bytearray)):
+            audio = decode_audio(bytes(audio))
+
+        if isinstance(audio, np.ndarray):
+            if audio.size == 0:
+                raise ValueError("Audio is empty")
+            return self.backend.transcribe(audio.astype(np.float32, copy=False), options)
+
+        audio_file = Path(audio)
+
+        if not audio_file.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio}")
+
+        return self.backend.transcribe(str(audio_file), options)
+
+    def transcribe_batch(self, audios: list[np.ndarray], options: dict | None = None) -> list[dict]:
+        """Transcribe several 16 kHz arrays with the same options, batched where the backend supports it"""
+        for audio in audios:
+            if audio.size == 0:
+                raise ValueError("Audio is empty")
+
+        return self.backend.transcribe_batch(
+            [audio.astype(np.float32, copy=False) for audio in audios],
+            options or transcribe_options()
+        )
+
+
+class TranscriptionBatcher:
+    """
+    Micro-batches concurrent transcription requests.
+
+    The first request opens a window of window_ms; everything arriving before
+    it closes (up to max_batch clips) is handed to run_batch together, one
+    call per distinct set of decode options. run_batch takes a list of arrays
+    and their options and returns a Future of the results in the same order,
+    so several batches can be in flight at once (one per inference worker).
+    Each caller gets back only its own result.
+    """
+    def __init__(self, run_batch, window_ms: float = 30, max_batch: int = 8):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, audio: np.ndarray, options: dict | None = None) -> Future:
+        if audio.size == 0:
+            raise ValueError("Audio is empty")
+
+        self._ensure_started()
+        future = Future()
+        self._queue.put((audio, options or transcribe_options(), future))
+        return future
+
+    def transcribe(self, audio: np.ndarray, options: dict | None = None) -> dict:
+        """Blocking call - for sync routes running on the threadpool"""
+        return self.submit(audio, options).result()
+
+    async def transcribe_async(self, audio: np.ndarray, options: dict | None = None) -> dict:
+        """Awaitable call - for async routes"""
+        return await asyncio.wrap_future(self.submit(audio, options))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+        }
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="stt-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            # Clips only share a decoder pass when they share decode options -
+            # initial_prompt included, since whisper.decode takes one per batch
+            groups = {}
+            for audio, options, future in batch:
+                key = tuple(sorted(options.items()))
+                groups.setdefault(key, (options, []))[1].append((audio, future))
+
+            for options, items in groups.values():
+                self._dispatch(items, options)
+
+    def _dispatch(self, batch: list, options: dict):
+        self.batches += 1
+        self.items += len(batch)
+        futures = [future for _, future in batch]
+
+        try:
+            pending = self.run_batch([audio for audio, _ in batch], options)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        def resolve(done: Future):
+            try:
+                results = done.result()
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                return
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+        pending.add_done_callback(resolve)
@@ -0,0 +1,67 @@
+import re
+
+# Sentence end: terminal punctuation (optionally closed by a quote/bracket) followed by whitespace
+_SENTENCE_END = re.compile(r'(?:(?<=[.!?])|(?<=[.!?]["\')\]]))\s+')
+
+
+def split_sentences(text: str, min_length: int = 20) -> list[str]:
+    """
+    Split text into sentences for incremental synthesis.
+    Fragments shorter than min_length are merged into the following sentence
+    so we don't pay per-call model overhead for "Yes." or "No."
+    """
+    sentences = []
+    pending = ""
+
+    for part in _SENTENCE_END.split(text.strip()):
+        part = part.strip()
+        if not part:
+            continue
+        pending = f"{pending} {part}" if pending else part
+        if len(pending) >= min_length:
+            sentences.append(pending)
+            pending = ""
+
+    if pending:
+        if sentences and len(pending) < min_length:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+
+    return sentences
+
+
+class SentenceBuffer:
+    """Accumulate streamed text and release sentences as soon as they are complete"""
+    def __init__(self, min_length: int = 20):
+        self.min_length = min_length
+        self.buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        self.buffer += text
+        parts = _SENTENCE_END.split(self.buffer)
+
+        # The last part has no sentence end after it yet
+        self.buffer = parts.pop()
+        sentences = []
+        pending = ""
+
+        for part in parts:
+            part = part.strip()
+            if not part:
+                continue
+            pending = f"{pending} {part}" if pending else part
+            if len(pending) >= self.min_length:
+                sentences.append(pending)
+                pending = ""
+
+        if pending:
+            # Too short on its own - wait for the next sentence
+            self.buffer = f"{pending} {self.buffer}"
+
+        return sentences
+
+    def flush(self) -> list[str]:
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
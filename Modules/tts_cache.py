@@ -0,0 +1,176 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+
+class TTSCache:
+    """
+    Content-addressed cache for synthesized speech.
+
+    Two tiers, both LRU and bounded by total bytes:
+      - memory: an OrderedDict of key -> WAV bytes
+      - disk:   <cache_dir>/<key>.wav, recency tracked in an OrderedDict
+                and persisted through file mtimes across restarts
+
+    A size limit of 0 disables that tier.
+    """
+    def __init__(self, cache_dir: str | Path = "tts_cache", memory_bytes: int = 64 * 1024 * 1024,
+                 disk_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_size = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_bytes > 0:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Whitespace and unicode variants don't change the audio"""
+        return re.sub(r'\s+', ' ', unicodedata.normalize("NFKC", text)).strip()
+
+    def key(self, text: str, model_name: str, speaker: str | None = None) -> str:
+        raw = f"{model_name}\0{speaker or ''}\0{self.normalize(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+
+        if on_disk:
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except OSError:
+                data = None
+
+            if data:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put_memory(key, data)
+                return data
+
+            with self._lock:
+                self._forget_disk(key)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes):
+        if not data:
+            return
+
+        with self._lock:
+            self._put_memory(key, data)
+            write_disk = 0 < len(data) <= self.disk_bytes and key not in self._disk
+
+        if write_disk:
+            path = self._path(key)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            try:
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"[TTS] Failed to write cache entry {path.name}: {e}")
+                return
+
+            with self._lock:
+                if key not in self._disk:
+                    self._disk[key] = len(data)
+                    self._disk_size += len(data)
+                evicted = self._evict_disk()
+
+            for old_key in evicted:
+                try:
+                    self._path(old_key).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+            }
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.wav"
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_bytes:
+            return
+
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+
+        self._memory[key] = data
+        self._memory_size += len(data)
+
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _forget_disk(self, key: str):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_size -= size
+
+    def _evict_disk(self) -> list[str]:
+        evicted = []
+        while self._disk_size > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            evicted.append(key)
+        return evicted
+
+    def _load_disk_index(self):
+        """Rebuild the LRU order from file mtimes (oldest first)"""
+        entries = []
+        for path in self.cache_dir.glob("*.wav"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+
+        for key in self._evict_disk():
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,93 @@
+import numpy as np
+from Modules.audio import SAMPLE_RATE
+
+
+class NoSpeechError(ValueError):
+    pass
+
+
+def trim_silence(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30,
+                 max_pause_ms: int = 500, padding_ms: int = 150, min_speech_ms: int = 200,
+                 floor_db: float = -50.0, margin_db: float = 10.0) -> tuple[np.ndarray, dict]:
+    """
+    Energy-based voice activity trimming.
+
+    Frames louder than an adaptive threshold (noise floor + margin_db, never
+    below floor_db dBFS) count as speech. A clip whose loudest frames are
+    less than margin_db above its noise floor is steady noise (or silence)
+    and has no speech. Leading and trailing non-speech is
+    cut, internal pauses longer than max_pause_ms are shortened to
+    max_pause_ms, and padding_ms of context is kept around speech so word
+    onsets aren't clipped.
+
+    Raises NoSpeechError if the clip is steady noise or less than
+    min_speech_ms of speech is found.
+    Returns the trimmed audio and a dict with original/trimmed durations.
+    """
+    frame = int(sample_rate * frame_ms / 1000)
+    original_duration = round(len(audio) / sample_rate, 2)
+    frame_count = len(audio) // frame
+
+    if frame_count == 0:
+        raise NoSpeechError("No speech detected")
+
+    frames = audio[:frame_count * frame].reshape(frame_count, frame)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+    # Noise floor from the quietest frames. Speech rises and falls between
+    # syllables even without pauses, so a flat energy profile is noise
+    noise_db = np.percentile(energy_db, 10)
+    peak_db = np.percentile(energy_db, 95)
+    if peak_db - noise_db < margin_db:
+        raise NoSpeechError("No speech detected")
+    threshold = max(floor_db, noise_db + margin_db)
+    speech = energy_db > threshold
+
+    if speech.sum() * frame_ms < min_speech_ms:
+        raise NoSpeechError("No speech detected")
+
+    # Contiguous runs of speech frames as [start, end) frame indices
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    pad = int(sample_rate * padding_ms / 1000)
+    max_pause = int(sample_rate * max_pause_ms / 1000)
+    pieces = []
+    previous_end = None
+
+    for start, end in zip(starts * frame, ends * frame):
+        start = max(0, start - pad)
+        end = min(len(audio), end + pad)
+
+        if previous_end is not None:
+            if start <= previous_end + max_pause:
+                # Short pause - keep it as is
+                start = previous_end
+            else:
+                # Long pause - keep only its first max_pause samples
+                pieces.append(audio[previous_end:previous_end + max_pause])
+
+        if end > start:
+            pieces.append(audio[start:end])
+        previous_end = max(end, previous_end or 0)
+
+    trimmed = np.concatenate(pieces)
+    return trimmed, {
+        "original_duration": original_duration,
+        "trimmed_duration": round(len(trimmed) / sample_rate, 2),
+        "speech_segments": len(starts),
+    }
+
+
+def find_pause(audio: np.ndarray, start: int = 0, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30) -> int:
+    """Sample index in the middle of the quietest frame at or after start - a safe place to cut between words"""
+    frame = int(sample_rate * frame_ms / 1000)
+    region = audio[start:]
+    frame_count = len(region) // frame
+    if frame_count == 0:
+        return len(audio)
+
+    frames = region[:frame_count * frame].reshape(frame_count, frame)
+    quietest = int(np.argmin(np.mean(frames ** 2, axis=1)))
+    return start + quietest * frame + frame // 2
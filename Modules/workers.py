@@ -0,0 +1,240 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+# Models owned by this process, keyed by pool kind. In a worker process there
+# is exactly one; in thread mode they live in the server process itself.
+_models = {}
+_models_lock = threading.Lock()
+
+
+class PoolBusyError(RuntimeError):
+    pass
+
+
+def parse_cores(spec: str | None) -> set[int] | None:
+    """Parse a core list like "0-3,6" into {0, 1, 2, 3, 6}"""
+    if not spec:
+        return None
+
+    cores = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cores.update(range(int(start), int(end) + 1))
+        elif part:
+            cores.add(int(part))
+    return cores or None
+
+
+def import_class(path: str):
+    """Resolve a "package.module:ClassName" path"""
+    module_name, _, class_name = path.partition(":")
+    if not module_name or not class_name:
+        raise ValueError(f"Expected 'module:Class', got '{path}'")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _load_model(kind: str, model_kwargs: dict):
+    # STT_ENGINE / TTS_ENGINE swap in another class with the same interface,
+    # e.g. the latency stubs in scripts/stub_engines.py for load testing
+    engine = os.environ.get(f"{kind.upper()}_ENGINE")
+    if engine:
+        return import_class(engine)(**model_kwargs)
+
+    if kind == "stt":
+        from Modules.sr import SpeechRecognizer
+        return SpeechRecognizer(**model_kwargs)
+    if kind == "tts":
+        from Modules.tts import TextToSpeech
+        return TextToSpeech(**model_kwargs)
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+def _init_worker(kind: str, threads: int, cores: set[int] | None, model_kwargs: dict):
+    """Pool initializer: pin the worker, size torch's thread pool and load the model once"""
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError as e:
+            print(f"[WORKER] Could not pin {kind} worker to cores {sorted(cores)}: {e}")
+
+    try:
+        import torch
+    except ImportError:
+        # Only the real engines need torch - a swapped-in STT_ENGINE/TTS_ENGINE may not
+        torch = None
+
+    if torch is not None:
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Already set once in this process (thread mode)
+            pass
+
+    with _models_lock:
+        if kind not in _models:
+            print(f"[WORKER] Loading {kind} model in pid {os.getpid()} ({threads} threads)")
+            _models[kind] = _load_model(kind, model_kwargs)
+
+
+def _call_model(kind: str, method: str, args: tuple, kwargs: dict):
+    return getattr(_models[kind], method)(*args, **kwargs)
+
+
+def _ping(kind: str) -> bool:
+    return kind in _models
+
+
+class InferencePool:
+    """
+    Runs model inference for one model kind ("stt" or "tts") off the event loop.
+
+    workers > 0 starts that many processes, each holding its own model copy,
+    pinned to `cores` (when given) and limited to `threads` torch threads, so
+    Whisper and Coqui don't fight over the same cores. workers = 0 runs a
+    single worker thread inside the server process instead.
+
+    At most queue_size requests may be queued or running at once; beyond that
+    submit() raises PoolBusyError so routes can answer 503 instead of piling up.
+    """
+    def __init__(self, kind: str, workers: int = 1, threads: int = 1, cores: set[int] | None = None,
+                 queue_size: int = 8, **model_kwargs):
+        self.kind = kind
+        self.workers = workers
+        self.threads = max(1, threads)
+        self.cores = cores
+        self.queue_size = queue_size
+        self.model_kwargs = model_kwargs
+
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._in_flight = 0
+        # When a job last finished, or the pool last went from idle to busy
+        self._last_progress = time.monotonic()
+        self._counter_lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        if self._executor is not None:
+            return
+
+        initargs = (self.kind, self.threads, self.cores, self.model_kwargs)
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=initargs,
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=f"{self.kind}-worker",
+                initializer=_init_worker,
+                initargs=initargs,
+            )
+        print(f"[WORKER] {self.kind} pool started: {self.workers or 'in-process'} workers, "
+              f"{self.threads} threads each, cores={sorted(self.cores) if self.cores else 'any'}")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def warm_up(self, timeout: float | None = None):
+        """Load the model in every worker ahead of the first request (blocking)"""
+        self.start()
+        futures = [self._executor.submit(_ping, self.kind) for _ in range(max(1, self.workers))]
+        for future in futures:
+            future.result(timeout=timeout)
+
+    def ping(self, timeout: float | None = None, stall_seconds: float = 120) -> bool:
+        """
+        Check a worker is alive and has its model loaded. Bypasses the queue
+        limit, but the check still waits behind running and queued jobs.
+
+        If it times out while jobs are in flight, the pool counts as busy
+        rather than dead as long as a job has finished (or the pool became
+        busy) within stall_seconds: PoolBusyError is raised instead of the
+        TimeoutError. A broken executor (a worker process died) fails at once.
+        """
+        if self._executor is None:
+            raise RuntimeError(f"{self.kind} pool is not started")
+
+        future = self._executor.submit(_ping, self.kind)
+        try:
+            loaded = future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            with self._counter_lock:
+                in_flight = self._in_flight
+                idle_for = time.monotonic() - self._last_progress
+            if in_flight and idle_for < stall_seconds:
+                raise PoolBusyError(
+                    f"{self.kind} workers are busy: {in_flight} jobs in flight, "
+                    f"last progress {idle_for:.1f}s ago"
+                )
+            raise TimeoutError(
+                f"{self.kind} workers did not answer within {timeout}s "
+                f"({in_flight} jobs in flight, last progress {idle_for:.1f}s ago)"
+            )
+
+        if not loaded:
+            raise RuntimeError(f"{self.kind} model is not loaded")
+        return True
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        if self._executor is None:
+            raise RuntimeError(f"{self.kind} pool is not started")
+
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusyError(f"{self.kind} workers are busy")
+
+        with self._counter_lock:
+            if not self._in_flight:
+                self._last_progress = time.monotonic()
+            self._in_flight += 1
+
+        try:
+            future = self._executor.submit(_call_model, self.kind, method, args, kwargs)
+        except Exception:
+            self._release()
+            raise
+
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def call(self, method: str, *args, **kwargs):
+        """Blocking call - for sync routes running on the threadpool"""
+        return self.submit(method, *args, **kwargs).result()
+
+    async def run(self, method: str, *args, **kwargs):
+        """Awaitable call - for async routes, never blocks the event loop"""
+        return await asyncio.wrap_future(self.submit(method, *args, **kwargs))
+
+    def stats(self) -> dict:
+        return {
+            "mode": "process" if self.workers > 0 else "thread",
+            "workers": self.workers,
+            "threads": self.threads,
+            "cores": sorted(self.cores) if self.cores else None,
+            "in_flight": self._in_flight,
+            "queue_size": self.queue_size,
+            "started": self.started,
+        }
+
+    def _release(self):
+        with self._counter_lock:
+            self._in_flight -= 1
+            self._last_progress = time.monotonic()
+        self._slots.release()
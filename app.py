@@ -1,623 +1,1469 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Depends, WebSocket, WebSocketDisconnect
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse, Response
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, EmailStr
-from pathlib import Path
-import subprocess
-import shutil
-import uuid
-import time
-import atexit
-import os
-import uvicorn
-import hashlib
-import secrets
-import json
-from datetime import datetime, timedelta
-from typing import Dict, List
-from AI_module.llm import LLM
-from Modules.sr import SpeechRecognizer
-from Modules.tts import TextToSpeech
-from Modules.db import (
-    get_topic_prompt, get_topic, init_db, add_topic,
-    create_user, get_user_by_email, verify_password,
-    create_session, get_session, delete_session,
-    save_chat_message, get_chat_messages
-)
-
-# utils
-def load_system_prompt(path="prompt.txt"):
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        return None
-
-def cleanup_old_temp_files(temp_dir: Path, max_age_seconds: int = 3600):
-    """Remove temp files older than max_age_seconds"""
-    if not temp_dir.exists():
-        return
-    
-    current_time = time.time()
-    for file in temp_dir.glob("*"):
-        if file.is_file():
-            file_age = current_time - file.stat().st_mtime
-            if file_age > max_age_seconds:
-                try:
-                    file.unlink()
-                    print(f"Cleaned up old temp file: {file.name}")
-                except Exception as e:
-                    print(f"Failed to delete old temp file {file}: {e}")
-
-# Security
-security = HTTPBearer(auto_error=False)
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Dependency to get current authenticated user"""
-    if not credentials:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    token = credentials.credentials
-    session = get_session(token)
-    
-    if not session:
-        raise HTTPException(status_code=401, detail="Invalid or expired session")
-    
-    return session
-
-# Optional auth - returns None if not authenticated
-def get_optional_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Optional authentication - returns user_id or None"""
-    if not credentials:
-        return None
-    
-    token = credentials.credentials
-    session = get_session(token)
-    
-    return session["user_id"] if session else None
-
-# WebSocket Connection Manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-        self.user_names: Dict[str, str] = {}
-    
-    async def connect(self, websocket: WebSocket, topic_id: str, user_id: str, user_name: str):
-        await websocket.accept()
-        if topic_id not in self.active_connections:
-            self.active_connections[topic_id] = []
-        self.active_connections[topic_id].append(websocket)
-        self.user_names[user_id] = user_name
-        
-        # Notify others that user joined
-        await self.broadcast(topic_id, {
-            "type": "user_joined",
-            "user_name": user_name,
-            "timestamp": datetime.now().isoformat()
-        }, exclude=websocket)
-    
-    def disconnect(self, websocket: WebSocket, topic_id: str):
-        if topic_id in self.active_connections:
-            self.active_connections[topic_id].remove(websocket)
-    
-    async def broadcast(self, topic_id: str, message: dict, exclude: WebSocket = None):
-        if topic_id not in self.active_connections:
-            return
-        
-        disconnected = []
-        for connection in self.active_connections[topic_id]:
-            if connection != exclude:
-                try:
-                    await connection.send_json(message)
-                except:
-                    disconnected.append(connection)
-        
-        # Clean up disconnected clients
-        for conn in disconnected:
-            self.active_connections[topic_id].remove(conn)
-
-manager = ConnectionManager()
-
-# app init
-app = FastAPI(
-    title="Agent API",
-    version="2.5.0",
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-llm = LLM()
-sr = SpeechRecognizer(model_size="base")
-
-# Initialize TTS - may take a moment to load the model
-print("[TTS] Loading Coqui TTS model...")
-tts = TextToSpeech()
-print("[TTS] Model loaded successfully")
-
-SYSTEM_PROMPT = load_system_prompt()
-
-TEMP_DIR = Path("temp_audio")
-TEMP_DIR.mkdir(exist_ok=True)
-
-# Cleanup old files on startup
-cleanup_old_temp_files(TEMP_DIR)
-# Initialize database
-init_db()
-
-# Add default topics
-add_topic(
-    "climate_action",
-    "Climate Action",
-    "You are an AI debating climate action. Be logical, balanced, and critical. Challenge the user's position constructively while presenting counter-arguments based on science, economics, and policy.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
-)
-
-add_topic(
-    "ai_alignment",
-    "AI Alignment",
-    "You are debating AI alignment and safety. Focus on risk assessment, regulation strategies, and the balance between innovation and control. Challenge assumptions critically.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
-)
-
-add_topic(
-    "free_speech",
-    "Free Speech",
-    "You are debating free speech principles. Navigate the tensions between absolute rights, contextual harm, censorship concerns, and platform responsibilities. Be nuanced and challenge extremes.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
-)
-
-add_topic(
-    "education_reform",
-    "Education Reform",
-    "You are debating education reform. Contrast traditional vs progressive models, discuss credential inflation, and focus on what actually produces competence. Challenge idealistic assumptions.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
-)
-
-add_topic(
-    "universal_basic_income",
-    "Universal Basic Income",
-    "You are debating universal basic income. Focus on economic incentives, inflation risks, productivity effects, and societal transformation. Challenge both utopian and dystopian views.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
-)
-
-add_topic(
-    "tech_monopolies",
-    "Tech Monopolies",
-    "You are debating tech monopolies and market power. Weigh innovation benefits against anti-competitive risks. Discuss breakups, regulation, and market dynamics critically.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
-)
-
-# Cleanup on shutdown
-@atexit.register
-def cleanup_on_exit():
-    """Clean up temp directory on application shutdown"""
-    try:
-        shutil.rmtree(TEMP_DIR)
-        print("Temp directory cleaned up on exit")
-    except Exception as e:
-        print(f"Failed to clean up temp directory: {e}")
-
-# models
-class SignupRequest(BaseModel):
-    name: str
-    email: EmailStr
-    password: str
-
-class LoginRequest(BaseModel):
-    email: EmailStr
-    password: str
-
-class AuthResponse(BaseModel):
-    token: str
-    user_id: str
-    name: str
-    email: str
-
-class QueryRequest(BaseModel):
-    query: str
-    topic_id: str
-
-class QueryResponse(BaseModel):
-    response: str
-
-class TranscriptionResponse(BaseModel):
-    text: str
-    language: str | None
-
-class TTSRequest(BaseModel):
-    text: str
-
-class ChatMessage(BaseModel):
-    message: str
-
-
-# routes
-@app.get("/", response_class=HTMLResponse)
-def read_root(request: Request):
-    return FileResponse("templates/index.html")
-
-@app.get("/auth", response_class=HTMLResponse)
-def read_auth_page(request: Request):
-    return FileResponse("templates/login.html")
-
-@app.get("/chose_topics", response_class=HTMLResponse)
-def read_topics_page(request: Request):
-    return FileResponse("templates/topics.html")
-
-@app.get("/room/{topic_id}", response_class=HTMLResponse)
-def read_room(request: Request, topic_id: str):
-    # Verify topic exists
-    topic = get_topic(topic_id)
-    if not topic:
-        raise HTTPException(status_code=404, detail="Topic not found")
-    return FileResponse("templates/room.html")
-
-@app.get("/chat/{topic_id}", response_class=HTMLResponse)
-def read_chat_room(request: Request, topic_id: str):
-    # Verify topic exists
-    topic = get_topic(topic_id)
-    if not topic:
-        raise HTTPException(status_code=404, detail="Topic not found")
-    return FileResponse("templates/chat_room.html")
-
-# Auth endpoints
-@app.post("/api/signup", response_model=AuthResponse)
-def signup(payload: SignupRequest):
-    """Create a new user account"""
-    # Validate input
-    if len(payload.password) < 6:
-        raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
-    
-    if len(payload.name.strip()) < 2:
-        raise HTTPException(status_code=400, detail="Name must be at least 2 characters")
-    
-    # Check if user already exists
-    existing_user = get_user_by_email(payload.email)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Create user
-    user = create_user(payload.name.strip(), payload.email, payload.password)
-    
-    if not user:
-        raise HTTPException(status_code=500, detail="Failed to create user")
-    
-    # Create session
-    token = create_session(user["id"])
-    
-    return {
-        "token": token,
-        "user_id": user["id"],
-        "name": user["name"],
-        "email": user["email"]
-    }
-
-@app.post("/api/login", response_model=AuthResponse)
-def login(payload: LoginRequest):
-    """Login user and create session"""
-    # Get user
-    user = get_user_by_email(payload.email)
-    
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid email or password")
-    
-    # Verify password
-    if not verify_password(payload.password, user["password_hash"]):
-        raise HTTPException(status_code=401, detail="Invalid email or password")
-    
-    # Create session
-    token = create_session(user["id"])
-    
-    return {
-        "token": token,
-        "user_id": user["id"],
-        "name": user["name"],
-        "email": user["email"]
-    }
-
-@app.post("/api/logout")
-def logout(user: dict = Depends(get_current_user)):
-    """Logout user and delete session"""
-    # The token is in the Authorization header
-    # We need to get it from the dependency
-    delete_session(user["session_token"])
-    return {"message": "Logged out successfully"}
-
-@app.get("/api/me")
-def get_current_user_info(user: dict = Depends(get_current_user)):
-    """Get current user information"""
-    return {
-        "user_id": user["user_id"],
-        "name": user["name"],
-        "email": user["email"]
-    }
-
-@app.get("/api/topic/{topic_id}")
-def get_topic_info(topic_id: str):
-    """API endpoint to get topic information"""
-    topic = get_topic(topic_id)
-    if not topic:
-        raise HTTPException(status_code=404, detail="Topic not found")
-    return {
-        "id": topic["id"],
-        "title": topic["title"]
-    }
-
-@app.get("/api/chat/{topic_id}/messages")
-def get_messages(topic_id: str, limit: int = 50):
-    """Get chat messages for a topic"""
-    messages = get_chat_messages(topic_id, limit)
-    return {"messages": messages}
-
-# WebSocket endpoint for real-time chat
-@app.websocket("/ws/chat/{topic_id}")
-async def websocket_chat(websocket: WebSocket, topic_id: str, token: str):
-    # Verify token
-    session = get_session(token)
-    if not session:
-        await websocket.close(code=1008, reason="Invalid token")
-        return
-    
-    user_id = session["user_id"]
-    user_name = session["name"]
-    
-    # Verify topic exists
-    topic = get_topic(topic_id)
-    if not topic:
-        await websocket.close(code=1008, reason="Topic not found")
-        return
-    
-    await manager.connect(websocket, topic_id, user_id, user_name)
-    
-    try:
-        while True:
-            data = await websocket.receive_json()
-            
-            if data.get("type") == "message":
-                message_text = data.get("message", "").strip()
-                if message_text:
-                    # Save to database
-                    save_chat_message(topic_id, user_id, user_name, message_text)
-                    
-                    # Broadcast to all connected clients
-                    await manager.broadcast(topic_id, {
-                        "type": "message",
-                        "user_id": user_id,
-                        "user_name": user_name,
-                        "message": message_text,
-                        "timestamp": datetime.now().isoformat()
-                    })
-    
-    except WebSocketDisconnect:
-        manager.disconnect(websocket, topic_id)
-        await manager.broadcast(topic_id, {
-            "type": "user_left",
-            "user_name": user_name,
-            "timestamp": datetime.now().isoformat()
-        })
-
-@app.post("/query", response_model=QueryResponse)
-def query_llm(payload: QueryRequest):
-    """Query the LLM - no auth required for now"""
-    if not payload.query.strip():
-        raise HTTPException(status_code=400, detail="Query cannot be empty")
-
-    # Get topic-specific prompt from database
-    topic_prompt = get_topic_prompt(payload.topic_id)
-    if not topic_prompt:
-        raise HTTPException(status_code=404, detail="Invalid topic")
-
-    # Combine base system prompt with topic-specific prompt
-    final_system_prompt = f"{SYSTEM_PROMPT}\n\n{topic_prompt}" if SYSTEM_PROMPT else topic_prompt
-
-    try:
-        result = llm.generate(
-            user_prompt=payload.query,
-            system_prompt=final_system_prompt,
-        )
-        return {"response": result}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.post("/speech-to-text", response_model=TranscriptionResponse)
-async def speech_to_text(file: UploadFile = File(...)):
-    """Speech to text conversion - no auth required"""
-    webm_path = TEMP_DIR / f"{uuid.uuid4()}.webm"
-    wav_path = TEMP_DIR / f"{uuid.uuid4()}.wav"
-
-    try:
-        # Save uploaded file
-        with open(webm_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Validate uploaded file
-        if webm_path.stat().st_size == 0:
-            raise HTTPException(status_code=400, detail="Uploaded audio file is empty")
-        
-        print(f"[STT] Received audio: {webm_path.stat().st_size} bytes")
-        
-        # Convert using ffmpeg with proper error handling
-        try:
-            result = subprocess.run([
-                'ffmpeg', 
-                '-i', str(webm_path),
-                '-acodec', 'pcm_s16le',
-                '-ar', '16000',
-                '-ac', '1',
-                '-y',
-                str(wav_path)
-            ], 
-            check=True, 
-            capture_output=True,
-            text=True
-            )
-            print(f"[STT] FFmpeg conversion successful")
-        except subprocess.CalledProcessError as e:
-            print(f"[STT] FFmpeg error: {e.stderr}")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Audio conversion failed: {e.stderr[:200]}"
-            )
-        
-        # Validate converted file
-        if not wav_path.exists() or wav_path.stat().st_size == 0:
-            raise HTTPException(
-                status_code=500, 
-                detail="Audio conversion produced empty file"
-            )
-        
-        print(f"[STT] Converted audio: {wav_path.stat().st_size} bytes")
-        
-        # Transcribe
-        try:
-            result = sr.transcribe(str(wav_path))
-            print(f"[STT] Transcription: '{result['text'][:50]}...' ({result['language']})")
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-        except Exception as e:
-            print(f"[STT] Transcription error: {e}")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Transcription failed: {str(e)}"
-            )
-        
-        return result
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"[STT] Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Cleanup temp files
-        for path in [webm_path, wav_path]:
-            try:
-                if path.exists():
-                    path.unlink()
-            except Exception as e:
-                print(f"[STT] Failed to delete temp file {path}: {e}")
-
-@app.post("/text-to-speech")
-def text_to_speech(payload: TTSRequest):
-    """Text to speech conversion - no auth required"""
-    if not payload.text.strip():
-        raise HTTPException(status_code=400, detail="Text cannot be empty")
-    
-    if len(payload.text) > 5000000:
-        raise HTTPException(status_code=400, detail="Text too long (max 5000000 characters)")
-
-    output_path = TEMP_DIR / f"{uuid.uuid4()}.wav"
-
-    try:
-        print(f"[TTS] Generating speech for: '{payload.text[:50]}...'")
-        
-        # Coqui TTS generates the file directly
-        tts.synthesize(payload.text, str(output_path))
-        
-        if not output_path.exists():
-            raise HTTPException(
-                status_code=500, 
-                detail="TTS failed to create audio file"
-            )
-        
-        file_size = output_path.stat().st_size
-        if file_size == 0:
-            raise HTTPException(
-                status_code=500, 
-                detail="TTS created empty audio file"
-            )
-        
-        print(f"[TTS] Generated audio: {file_size} bytes")
-        
-        with open(output_path, 'rb') as f:
-            audio_data = f.read()
-        
-        output_path.unlink()
-        print(f"[TTS] Cleaned up temp file: {output_path.name}")
-        
-        return Response(
-            content=audio_data,
-            media_type="audio/wav",
-            headers={
-                "Content-Disposition": "attachment; filename=speech.wav",
-                "Content-Length": str(len(audio_data)),
-                "Cache-Control": "no-cache"
-            }
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"[TTS] Error: {e}")
-        if output_path.exists():
-            try:
-                output_path.unlink()
-            except:
-                pass
-        raise HTTPException(status_code=500, detail=f"TTS failed: {str(e)}")
-
-@app.get("/health")
-def health_check():
-    health = {
-        "status": "healthy",
-        "components": {},
-        "temp": {},
-    }
-
-    # Temp dir check
-    try:
-        health["temp"] = {
-            "path": str(TEMP_DIR),
-            "files": len(list(TEMP_DIR.glob("*"))),
-            "writable": TEMP_DIR.exists()
-        }
-    except Exception as e:
-        health["status"] = "degraded"
-        health["temp"]["error"] = str(e)
-
-    # DB check
-    try:
-        from Modules.db import get_connection
-        conn = get_connection()
-        conn.execute("SELECT 1")
-        conn.close()
-        health["components"]["db"] = "ok"
-    except Exception as e:
-        health["status"] = "unhealthy"
-        health["components"]["db"] = f"error: {e}"
-
-    # LLM check (lightweight)
-    try:
-        _ = llm.generate(
-            user_prompt="ping",
-            system_prompt="Reply with 'pong'."
-        )
-        health["components"]["llm"] = "ok"
-    except Exception as e:
-        health["status"] = "unhealthy"
-        health["components"]["llm"] = f"error: {e}"
-
-    # TTS check - Coqui TTS uses .tts attribute
-    try:
-        tts.tts  # Check if TTS model is loaded
-        health["components"]["tts"] = "ok"
-    except Exception as e:
-        health["status"] = "unhealthy"
-        health["components"]["tts"] = f"error: {e}"
-
-    # STT check (model loaded)
-    try:
-        sr.model  # model attribute exists?
-        health["components"]["stt"] = "ok"
-    except Exception as e:
-        health["status"] = "unhealthy"
-        health["components"]["stt"] = f"error: {e}"
-
-    return health
-
-
-if __name__ == "__main__":
-    port = int(os.environ.get("PORT", 8080))
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Depends, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, EmailStr
+from pathlib import Path
+import shutil
+import uuid
+import time
+import atexit
+import os
+import uvicorn
+import hashlib
+import secrets
+import json
+import base64
+import asyncio
+import queue
+import struct
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List
+import numpy as np
+from AI_module.memory import ConversationMemory, count_tokens, summarize_turns
+from AI_module.response_cache import ResponseCache
+from Modules.audio import (
+    SAMPLE_RATE, OUTPUT_FORMATS, AudioDecodeError, AudioEncodeError,
+    decode_audio, encode_audio, wav_duration
+)
+from Modules.text import SentenceBuffer, split_sentences
+from Modules.tts_cache import TTSCache
+from Modules.workers import InferencePool, PoolBusyError, import_class, parse_cores
+from Modules.sr import TranscriptionBatcher, transcribe_options
+from Modules.vad import NoSpeechError, find_pause, trim_silence
+from Modules.health import HealthProber, ProbeDegraded
+from Modules.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, SIZE_BUCKETS, registry
+from Modules.db import (
+    get_connection, release_connection, close_connections, get_topic_prompt, get_topic, init_db, add_topics,
+    create_user, get_user_by_email, verify_password,
+    create_session, get_session, delete_session, cleanup_expired_sessions, session_cache,
+    save_chat_messages, get_chat_page
+)
+from Modules import db_async
+from Modules.chat_writer import DURABILITY_MODES, ChatWriter
+
+# utils
+def load_system_prompt(path="prompt.txt"):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def cleanup_old_temp_files(temp_dir: Path, max_age_seconds: int = 3600):
+    """Remove temp files older than max_age_seconds"""
+    if not temp_dir.exists():
+        return
+    
+    current_time = time.time()
+    for file in temp_dir.glob("*"):
+        if file.is_file():
+            file_age = current_time - file.stat().st_mtime
+            if file_age > max_age_seconds:
+                try:
+                    file.unlink()
+                    print(f"Cleaned up old temp file: {file.name}")
+                except Exception as e:
+                    print(f"Failed to delete old temp file {file}: {e}")
+
+# Security
+security = HTTPBearer(auto_error=False)
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Dependency to get current authenticated user"""
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    token = credentials.credentials
+    session = get_session(token)
+    
+    if not session:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    
+    return session
+
+# Optional auth - returns None if not authenticated
+def get_optional_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Optional authentication - returns user_id or None"""
+    if not credentials:
+        return None
+    
+    token = credentials.credentials
+    session = get_session(token)
+    
+    return session["user_id"] if session else None
+
+# Per-stage metrics for /metrics; children for fixed labels are resolved once here
+STT_UPLOAD_BYTES = registry.histogram("stt_upload_bytes", "Size of uploaded recordings", buckets=SIZE_BUCKETS)
+AUDIO_DECODE_SECONDS = registry.histogram("audio_decode_seconds", "Decoding uploads to 16 kHz PCM (in-process, PyAV or ffmpeg)")
+STT_SECONDS = registry.histogram("stt_seconds", "Whisper transcription time, including batching and queueing")
+LLM_SECONDS = registry.histogram("llm_seconds", "Upstream LLM call latency (cache hits excluded)", ("mode",))
+LLM_SYNC_SECONDS = LLM_SECONDS.labels("sync")
+LLM_ASYNC_SECONDS = LLM_SECONDS.labels("async")
+LLM_STREAM_SECONDS = LLM_SECONDS.labels("stream")
+LLM_FIRST_TOKEN_SECONDS = registry.histogram("llm_first_token_seconds", "Time to the first streamed LLM token")
+TTS_SECONDS = registry.histogram("tts_synthesis_seconds", "Coqui synthesis time (cache misses)")
+TTS_OUTPUT_BYTES = registry.histogram("tts_output_bytes", "Size of synthesized WAV audio", buckets=SIZE_BUCKETS)
+WEBSOCKET_CONNECTIONS = registry.gauge("websocket_connections", "Open chat WebSocket connections", ("topic",))
+TEMP_FILES = registry.gauge("temp_dir_files", "Files currently in the temp audio directory")
+
+# WebSocket Connection Manager
+class ConnectionManager:
+    def __init__(self):
+        self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.user_names: Dict[str, str] = {}
+    
+    async def connect(self, websocket: WebSocket, topic_id: str, user_id: str, user_name: str):
+        await websocket.accept()
+        if topic_id not in self.active_connections:
+            self.active_connections[topic_id] = []
+        self.active_connections[topic_id].append(websocket)
+        self.user_names[user_id] = user_name
+        
+        # Notify others that user joined
+        await self.broadcast(topic_id, {
+            "type": "user_joined",
+            "user_name": user_name,
+            "timestamp": datetime.now().isoformat()
+        }, exclude=websocket)
+    
+    def disconnect(self, websocket: WebSocket, topic_id: str):
+        # broadcast() may already have dropped it after a failed send
+        if websocket in self.active_connections.get(topic_id, []):
+            self.active_connections[topic_id].remove(websocket)
+    
+    async def broadcast(self, topic_id: str, message: dict, exclude: WebSocket = None):
+        if topic_id not in self.active_connections:
+            return
+        
+        disconnected = []
+        # A copy - connections join and leave while sends are awaited
+        for connection in list(self.active_connections[topic_id]):
+            if connection != exclude:
+                try:
+                    await connection.send_json(message)
+                except:
+                    disconnected.append(connection)
+        
+        # Clean up disconnected clients
+        for conn in disconnected:
+            self.disconnect(conn, topic_id)
+
+manager = ConnectionManager()
+
+# Chat messages are persisted write-behind, in batches - see Modules/chat_writer.py
+CHAT_DURABILITY = os.environ.get("CHAT_DURABILITY", "buffered")
+if CHAT_DURABILITY not in DURABILITY_MODES:
+    raise ValueError(f"CHAT_DURABILITY must be one of {', '.join(DURABILITY_MODES)}")
+chat_writer = ChatWriter(
+    save_chat_messages,
+    flush_ms=float(os.environ.get("CHAT_FLUSH_MS", 50)),
+    flush_size=int(os.environ.get("CHAT_FLUSH_SIZE", 200)),
+    max_pending=int(os.environ.get("CHAT_QUEUE_SIZE", 10000)),
+)
+# Counted when scraped, nothing extra on connect/disconnect
+WEBSOCKET_CONNECTIONS.set_function(
+    lambda: {(topic_id,): len(connections) for topic_id, connections in list(manager.active_connections.items())}
+)
+
+# Incremental transcription for /ws/voice
+VOICE_PARTIAL_INTERVAL = float(os.environ.get("VOICE_PARTIAL_INTERVAL", 1.0))
+VOICE_WINDOW_SECONDS = 30  # Whisper's context window
+# Once this much audio is uncommitted, a partial pass commits it up to the quietest pause
+VOICE_COMMIT_SECONDS = float(os.environ.get("VOICE_COMMIT_SECONDS", 10))
+VOICE_COMMIT_MARGIN_SECONDS = 2  # the newest audio may end mid-word and is never committed
+# Every pass re-decodes the utterance from its first byte, so its size is capped;
+# past either limit the utterance is finalized and the socket closed
+VOICE_MAX_BYTES = int(os.environ.get("VOICE_MAX_BYTES", 2 * 1024 * 1024))
+VOICE_MAX_SECONDS = float(os.environ.get("VOICE_MAX_SECONDS", 120))
+
+class VoiceStream:
+    """
+    Audio received so far for one utterance on /ws/voice.
+
+    MediaRecorder chunks are not independently decodable (only the first one
+    carries the container header), so the whole byte stream is re-decoded on
+    every pass. Transcription is incremental: once VOICE_COMMIT_SECONDS of
+    audio has built up, a partial pass transcribes it up to a pause and
+    commits that text. Later partials and the final pass only transcribe the
+    audio after the committed point (partials at most its last
+    VOICE_WINDOW_SECONDS) and prepend the committed text. Every piece is
+    trimmed by the VAD first, and audio past VOICE_MAX_SECONDS is never
+    transcribed.
+    """
+    def __init__(self, options: dict):
+        self.options = options
+        self.lock = asyncio.Lock()
+        self.reset()
+
+    def reset(self):
+        self.data = bytearray()
+        self.version = 0
+        self.last_version = 0
+        self.last_result = None
+        self.last_covers_all = False
+        # Decoded length as of the last pass
+        self.duration = 0.0
+        self.committed_samples = 0
+        self.committed_text = ""
+        self.committed_language = None
+
+    def append(self, chunk: bytes):
+        self.data.extend(chunk)
+        self.version += 1
+
+    @property
+    def has_new_audio(self) -> bool:
+        return self.version > self.last_version
+
+    @property
+    def over_limit(self) -> bool:
+        return len(self.data) > VOICE_MAX_BYTES or self.duration > VOICE_MAX_SECONDS
+
+    async def transcribe(self, final: bool = False) -> dict:
+        """Transcribe the uncommitted audio, reusing the last partial if nothing new arrived"""
+        async with self.lock:
+            if final and not self.has_new_audio and self.last_covers_all:
+                return self.last_result
+
+            version = self.version
+            started = time.perf_counter()
+            audio = await run_in_threadpool(
+                decode_audio, bytes(self.data), allow_partial=not final
+            )
+            AUDIO_DECODE_SECONDS.observe(time.perf_counter() - started)
+            self.duration = len(audio) / SAMPLE_RATE
+            audio = audio[:int(VOICE_MAX_SECONDS * SAMPLE_RATE)]
+
+            if not final:
+                await self._commit(audio)
+
+            tail = audio[self.committed_samples:]
+            window = tail if final else tail[-VOICE_WINDOW_SECONDS * SAMPLE_RATE:]
+            if len(window):
+                result = await self._transcribe(window)
+            else:
+                result = {"text": "", "language": self.committed_language}
+            result["text"] = " ".join(filter(None, (self.committed_text, result["text"])))
+            result["duration"] = round(len(audio) / SAMPLE_RATE, 2)
+
+            self.last_version = version
+            self.last_result = result
+            self.last_covers_all = len(window) == len(tail)
+            return result
+
+    async def _commit(self, audio: np.ndarray):
+        """Transcribe the uncommitted audio up to its quietest pause and freeze that text"""
+        tail = audio[self.committed_samples:]
+        margin = VOICE_COMMIT_MARGIN_SECONDS * SAMPLE_RATE
+        if len(tail) < VOICE_COMMIT_SECONDS * SAMPLE_RATE + margin:
+            return
+
+        # Cut in the later half so committed pieces keep enough context
+        cut = find_pause(tail[:len(tail) - margin], start=int(VOICE_COMMIT_SECONDS * SAMPLE_RATE / 2))
+        result = await self._transcribe(tail[:cut])
+        self.committed_text = " ".join(filter(None, (self.committed_text, result["text"])))
+        self.committed_language = result["language"]
+        self.committed_samples += cut
+
+    async def _transcribe(self, audio: np.ndarray) -> dict:
+        # Same VAD as uploads: silence never reaches the model, pauses are shortened
+        if VAD_ENABLED:
+            try:
+                audio, _ = trim_silence(audio, max_pause_ms=VAD_MAX_PAUSE_MS)
+            except NoSpeechError:
+                return {"text": "", "language": self.committed_language}
+        started = time.perf_counter()
+        result = await stt_batcher.transcribe_async(audio, self.options)
+        STT_SECONDS.observe(time.perf_counter() - started)
+        return result
+
+async def stream_partials(websocket: WebSocket, stream: VoiceStream):
+    """Re-transcribe the growing buffer in the background and push partial results"""
+    while True:
+        await asyncio.sleep(VOICE_PARTIAL_INTERVAL)
+        if not stream.has_new_audio:
+            continue
+
+        try:
+            result = await stream.transcribe()
+        except (AudioDecodeError, ValueError):
+            # Too little audio to decode yet
+            continue
+        except Exception as e:
+            print(f"[STT] Partial transcription error: {e}")
+            continue
+
+        try:
+            await websocket.send_json({"type": "partial", **result})
+        except (WebSocketDisconnect, RuntimeError):
+            return
+
+async def send_final(websocket: WebSocket, stream: VoiceStream):
+    """Transcribe the whole utterance, send the "final" result and start a new utterance"""
+    if not stream.data:
+        await websocket.send_json({"type": "final", "text": "", "language": None, "duration": 0})
+        return
+
+    try:
+        result = await stream.transcribe(final=True)
+        print(f"[STT] Final transcription: '{result['text'][:50]}...' ({result['language']})")
+        await websocket.send_json({"type": "final", **result})
+    except (AudioDecodeError, ValueError) as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+    except Exception as e:
+        print(f"[STT] Transcription error: {e}")
+        await websocket.send_json({"type": "error", "detail": f"Transcription failed: {e}"})
+    finally:
+        stream.reset()
+
+# app init
+app = FastAPI(
+    title="Agent API",
+    version="2.5.0",
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Models load in the background after startup; routes that need one answer 503 until it is ready
+llm = None
+model_state = {
+    name: {"state": "pending", "load_ms": None, "error": None}
+    for name in ("llm", "stt", "tts")
+}
+MODEL_RETRY_AFTER = os.environ.get("MODEL_RETRY_AFTER", "5")
+
+# Inference workers - Whisper and Coqui run in their own processes, never on the event loop
+CPU_COUNT = os.cpu_count() or 1
+STT_MODEL = os.environ.get("STT_MODEL", "base")
+STT_BACKEND = os.environ.get("STT_BACKEND", "whisper")
+TTS_MODEL = os.environ.get("TTS_MODEL", "tts_models/en/ljspeech/tacotron2-DDC")
+STT_WORKERS = int(os.environ.get("STT_WORKERS", 1))
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", 1))
+STT_CORES = parse_cores(os.environ.get("STT_CORES"))
+TTS_CORES = parse_cores(os.environ.get("TTS_CORES"))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", 8))
+
+def default_threads(cores: set[int] | None, workers: int) -> int:
+    """Split the pool's cores (half the machine if unpinned) between its workers"""
+    available = len(cores) if cores else max(1, CPU_COUNT // 2)
+    return max(1, available // max(1, workers))
+
+stt_pool = InferencePool(
+    "stt",
+    workers=STT_WORKERS,
+    threads=int(os.environ.get("STT_THREADS", default_threads(STT_CORES, STT_WORKERS))),
+    cores=STT_CORES,
+    queue_size=INFERENCE_QUEUE_SIZE,
+    model_size=STT_MODEL,
+    backend=STT_BACKEND,
+)
+tts_pool = InferencePool(
+    "tts",
+    workers=TTS_WORKERS,
+    threads=int(os.environ.get("TTS_THREADS", default_threads(TTS_CORES, TTS_WORKERS))),
+    cores=TTS_CORES,
+    queue_size=INFERENCE_QUEUE_SIZE,
+    model_name=TTS_MODEL,
+)
+
+# Concurrent transcriptions (several rooms finishing at once) share one Whisper pass
+stt_batcher = TranscriptionBatcher(
+    lambda audios, options: stt_pool.submit("transcribe_batch", audios, options),
+    window_ms=float(os.environ.get("STT_BATCH_WINDOW_MS", 30)),
+    max_batch=int(os.environ.get("STT_BATCH_SIZE", 8)),
+)
+
+SYSTEM_PROMPT = load_system_prompt()
+
+TEMP_DIR = Path("temp_audio")
+TEMP_DIR.mkdir(exist_ok=True)
+
+# Decode defaults for every transcription; /speech-to-text can override them per request.
+# Pinning STT_LANGUAGE skips detection, STT_BEAM_SIZE=0 decodes greedily and
+# STT_TEMPERATURE_FALLBACK=0 skips Whisper's re-decoding retries
+STT_LANGUAGE = os.environ.get("STT_LANGUAGE") or None
+STT_BEAM_SIZE = int(os.environ.get("STT_BEAM_SIZE", 0))
+STT_TEMPERATURE_FALLBACK = os.environ.get("STT_TEMPERATURE_FALLBACK", "1") == "1"
+STT_FP16 = os.environ.get("STT_FP16", "0") == "1"
+# Prime Whisper with the topic title so terms like "UBI" come out right. Opt-in:
+# the prompt is a decode option and a batched Whisper pass takes one prompt,
+# so with it on, clips from different topics never share a batch (STT_BATCH_*)
+STT_TOPIC_PROMPT = os.environ.get("STT_TOPIC_PROMPT", "0") == "1"
+
+# Debate history per session, kept under a fixed token budget (tiktoken)
+conversation_memory = ConversationMemory(
+    summarize=lambda summary, turns: summarize_turns(llm, summary, turns),
+    token_budget=int(os.environ.get("MEMORY_TOKEN_BUDGET", 2000)),
+    summary_tokens=int(os.environ.get("MEMORY_SUMMARY_TOKENS", 400)),
+    ttl_seconds=int(os.environ.get("MEMORY_SESSION_TTL", 3600)),
+    max_sessions=int(os.environ.get("MEMORY_MAX_SESSIONS", 1000)),
+)
+
+# Completed LLM replies per (system prompt, normalized query); identical in-flight queries share one call
+llm_cache = ResponseCache(
+    ttl_seconds=float(os.environ.get("LLM_CACHE_TTL", 300)),
+    max_entries=int(os.environ.get("LLM_CACHE_SIZE", 1000)),
+)
+
+# Server-side voice activity trimming before Whisper
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "1") == "1"
+VAD_MAX_PAUSE_MS = int(os.environ.get("VAD_MAX_PAUSE_MS", 500))
+
+# Synthesized speech cache - repeated replies skip the TTS model entirely
+tts_cache = TTSCache(
+    cache_dir=os.environ.get("TTS_CACHE_DIR", "tts_cache"),
+    memory_bytes=int(float(os.environ.get("TTS_CACHE_MEMORY_MB", 64)) * 1024 * 1024),
+    disk_bytes=int(float(os.environ.get("TTS_CACHE_DISK_MB", 512)) * 1024 * 1024),
+)
+
+# Default debate topics, inserted at startup if missing
+DEFAULT_TOPICS = [
+    (
+        "climate_action",
+        "Climate Action",
+        "You are an AI debating climate action. Be logical, balanced, and critical. Challenge the user's position constructively while presenting counter-arguments based on science, economics, and policy.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
+    ),
+    (
+        "ai_alignment",
+        "AI Alignment",
+        "You are debating AI alignment and safety. Focus on risk assessment, regulation strategies, and the balance between innovation and control. Challenge assumptions critically.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
+    ),
+    (
+        "free_speech",
+        "Free Speech",
+        "You are debating free speech principles. Navigate the tensions between absolute rights, contextual harm, censorship concerns, and platform responsibilities. Be nuanced and challenge extremes.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
+    ),
+    (
+        "education_reform",
+        "Education Reform",
+        "You are debating education reform. Contrast traditional vs progressive models, discuss credential inflation, and focus on what actually produces competence. Challenge idealistic assumptions.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
+    ),
+    (
+        "universal_basic_income",
+        "Universal Basic Income",
+        "You are debating universal basic income. Focus on economic incentives, inflation risks, productivity effects, and societal transformation. Challenge both utopian and dystopian views.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
+    ),
+    (
+        "tech_monopolies",
+        "Tech Monopolies",
+        "You are debating tech monopolies and market power. Weigh innovation benefits against anti-competitive risks. Discuss breakups, regulation, and market dynamics critically.try answer in trhe least amount of words possible but s till making a strong Point. do not Use * # or anyother weird symbol or emojis."
+    ),
+]
+
+def load_llm():
+    global llm
+    engine = os.environ.get("LLM_ENGINE")
+    if engine:
+        # Drop-in replacement with LLM's interface (e.g. scripts/stub_engines.py:StubLLM)
+        llm = import_class(engine)()
+    else:
+        # google-genai is slow to import - keep it out of module import time
+        from AI_module.llm import LLM
+        llm = LLM()
+    # tiktoken fetches its vocabulary on first use - not on a request
+    count_tokens("")
+
+MODEL_LOADERS = {
+    "llm": load_llm,
+    "stt": stt_pool.warm_up,
+    "tts": tts_pool.warm_up,
+}
+
+def load_model(name: str):
+    """Run one model loader and record its state for /ready"""
+    state = model_state[name]
+    state["state"] = "loading"
+    started = time.perf_counter()
+    print(f"[STARTUP] Loading {name} model...")
+
+    try:
+        MODEL_LOADERS[name]()
+    except Exception as e:
+        state["state"] = "error"
+        state["error"] = str(e)
+        print(f"[STARTUP] Failed to load {name} model: {e}")
+        return
+
+    state["load_ms"] = elapsed_ms(started)
+    state["state"] = "ready"
+    print(f"[STARTUP] {name} model loaded in {state['load_ms']}ms")
+    # Don't wait a whole probe interval to report the model as healthy
+    health_prober.run_once(name)
+
+def requires(*names: str):
+    """Route dependency: 503 + Retry-After until the named models are loaded"""
+    def check_ready():
+        for name in names:
+            state = model_state[name]["state"]
+            if state != "ready":
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"{name.upper()} model is {state}, try again shortly",
+                    headers={"Retry-After": MODEL_RETRY_AFTER}
+                )
+    return check_ready
+
+# Component probes run on their own schedule; /health only reads the last results
+HEALTH_PROBE_TIMEOUT = float(os.environ.get("HEALTH_PROBE_TIMEOUT", 10))
+# A busy worker pool is only reported dead once no job has finished for this long
+HEALTH_WORKER_STALL_SECONDS = float(os.environ.get("HEALTH_WORKER_STALL_SECONDS", 120))
+
+def probe_db():
+    conn = get_connection()
+    try:
+        conn.execute("SELECT 1")
+    finally:
+        release_connection(conn)
+
+def probe_llm():
+    if llm is None:
+        raise RuntimeError(f"model is {model_state['llm']['state']}")
+    # Model metadata lookup - checks reachability and the API key without a paid generation
+    llm.ping()
+
+def probe_pool(name: str, pool: InferencePool):
+    def probe():
+        if model_state[name]["state"] != "ready":
+            raise RuntimeError(f"model is {model_state[name]['state']}")
+        try:
+            pool.ping(timeout=HEALTH_PROBE_TIMEOUT, stall_seconds=HEALTH_WORKER_STALL_SECONDS)
+        except PoolBusyError as e:
+            # Saturated but still finishing jobs - the ping just queued behind them
+            raise ProbeDegraded(str(e))
+    return probe
+
+def probe_temp_dir():
+    probe_file = TEMP_DIR / f".health-{os.getpid()}"
+    probe_file.write_bytes(b"ok")
+    probe_file.unlink()
+    return {"path": str(TEMP_DIR), "files": len(list(TEMP_DIR.glob("*")))}
+
+TEMP_FILES.set_function(lambda: sum(1 for _ in TEMP_DIR.iterdir()))
+
+health_prober = HealthProber()
+health_prober.add("db", probe_db, float(os.environ.get("HEALTH_DB_INTERVAL", 10)))
+health_prober.add("llm", probe_llm, float(os.environ.get("HEALTH_LLM_INTERVAL", 60)))
+health_prober.add("stt", probe_pool("stt", stt_pool), float(os.environ.get("HEALTH_WORKER_INTERVAL", 15)))
+health_prober.add("tts", probe_pool("tts", tts_pool), float(os.environ.get("HEALTH_WORKER_INTERVAL", 15)))
+health_prober.add("temp", probe_temp_dir, float(os.environ.get("HEALTH_TEMP_INTERVAL", 30)), critical=False)
+
+# Expired sessions are deleted here on a schedule, so auth checks stay read-only
+SESSION_CLEANUP_INTERVAL = float(os.environ.get("SESSION_CLEANUP_INTERVAL", 3600))
+session_sweeper_stop = threading.Event()
+
+def sweep_expired_sessions():
+    while True:
+        try:
+            deleted = cleanup_expired_sessions()
+            if deleted:
+                print(f"[AUTH] Removed {deleted} expired sessions")
+        except Exception as e:
+            print(f"[AUTH] Session cleanup failed: {e}")
+        if session_sweeper_stop.wait(SESSION_CLEANUP_INTERVAL):
+            return
+
+@app.on_event("startup")
+def startup():
+    # Cleanup old files on startup
+    cleanup_old_temp_files(TEMP_DIR)
+    # Initialize database
+    init_db()
+    add_topics(DEFAULT_TOPICS)
+
+    # Auth, topics and chat are served right away; models load in the background
+    for name in MODEL_LOADERS:
+        threading.Thread(target=load_model, args=(name,), name=f"load-{name}", daemon=True).start()
+
+    health_prober.start()
+    session_sweeper_stop.clear()
+    threading.Thread(target=sweep_expired_sessions, name="session-sweeper", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_inference_pools():
+    health_prober.stop()
+    session_sweeper_stop.set()
+    for pool in (stt_pool, tts_pool):
+        pool.shutdown()
+    chat_writer.close()
+    db_async.shutdown()
+    # Checkpoints the WAL back into the database file
+    close_connections()
+
+@app.exception_handler(PoolBusyError)
+async def pool_busy_handler(request: Request, exc: PoolBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"{exc}, try again shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+# Cleanup on shutdown
+@atexit.register
+def cleanup_on_exit():
+    """Clean up temp directory on application shutdown"""
+    try:
+        shutil.rmtree(TEMP_DIR)
+        print("Temp directory cleaned up on exit")
+    except Exception as e:
+        print(f"Failed to clean up temp directory: {e}")
+
+# models
+class SignupRequest(BaseModel):
+    name: str
+    email: EmailStr
+    password: str
+
+class LoginRequest(BaseModel):
+    email: EmailStr
+    password: str
+
+class AuthResponse(BaseModel):
+    token: str
+    user_id: str
+    name: str
+    email: str
+
+class QueryRequest(BaseModel):
+    query: str
+    topic_id: str
+    session_id: str | None = None  # client-generated per debate; omit for a stateless query
+
+class QueryResponse(BaseModel):
+    response: str
+
+class TranscriptionResponse(BaseModel):
+    text: str
+    language: str | None
+    duration: float | None = None
+    speech_duration: float | None = None
+
+class TTSRequest(BaseModel):
+    text: str
+    format: str | None = None  # "wav" or "opus"; falls back to the Accept header, then wav
+
+class ChatMessage(BaseModel):
+    message: str
+
+class VoiceTurnResponse(BaseModel):
+    transcript: str
+    language: str | None
+    response: str
+    audio: str | None  # base64-encoded WAV
+    timings: Dict[str, float]
+
+
+# pipeline helpers
+def build_system_prompt(topic_id: str) -> str:
+    """Combine the base system prompt with the topic-specific prompt"""
+    # Get topic-specific prompt from database
+    topic_prompt = get_topic_prompt(topic_id)
+    if not topic_prompt:
+        raise HTTPException(status_code=404, detail="Invalid topic")
+
+    return f"{SYSTEM_PROMPT}\n\n{topic_prompt}" if SYSTEM_PROMPT else topic_prompt
+
+def stt_options(topic: dict | None = None, language: str | None = None, beam_size: int | None = None,
+                temperature_fallback: bool | None = None, fp16: bool | None = None) -> dict:
+    """Deployment decode defaults, overridden by whatever the request set"""
+    try:
+        return transcribe_options(
+            language=language if language is not None else STT_LANGUAGE,
+            beam_size=beam_size if beam_size is not None else STT_BEAM_SIZE,
+            temperature_fallback=temperature_fallback if temperature_fallback is not None else STT_TEMPERATURE_FALLBACK,
+            fp16=fp16 if fp16 is not None else STT_FP16,
+            initial_prompt=f"A debate about {topic['title']}." if topic and STT_TOPIC_PROMPT else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def timed_generate(**kwargs) -> str:
+    with LLM_SYNC_SECONDS.time():
+        return llm.generate(**kwargs)
+
+async def timed_agenerate(**kwargs) -> str:
+    started = time.perf_counter()
+    try:
+        return await llm.agenerate(**kwargs)
+    finally:
+        LLM_ASYNC_SECONDS.observe(time.perf_counter() - started)
+
+def generate_reply(user_prompt: str, system_prompt: str, topic_id: str, history: list[dict] | None = None) -> str:
+    """llm.generate behind the response cache; turns with history and cache-disabled topics bypass it"""
+    topic = get_topic(topic_id)
+    if history or (topic and not topic["cache_enabled"]):
+        return timed_generate(user_prompt=user_prompt, system_prompt=system_prompt, history=history)
+
+    key = llm_cache.key(llm.model, llm.temperature, system_prompt, user_prompt)
+    return llm_cache.get_or_generate(
+        key,
+        lambda: timed_generate(user_prompt=user_prompt, system_prompt=system_prompt)
+    )
+
+async def agenerate_reply(user_prompt: str, system_prompt: str, topic_id: str, history: list[dict] | None = None) -> str:
+    """generate_reply for async routes, on the async Gemini client"""
+    topic = await db_async.get_topic(topic_id)
+    if history or (topic and not topic["cache_enabled"]):
+        return await timed_agenerate(user_prompt=user_prompt, system_prompt=system_prompt, history=history)
+
+    key = llm_cache.key(llm.model, llm.temperature, system_prompt, user_prompt)
+    return await llm_cache.aget_or_generate(
+        key,
+        lambda: timed_agenerate(user_prompt=user_prompt, system_prompt=system_prompt)
+    )
+
+def memory_key(topic_id: str, session_id: str | None) -> str | None:
+    # The same client debating two topics keeps two histories
+    return f"{topic_id}:{session_id}" if session_id else None
+
+def transcribe_upload(file: UploadFile, options: dict | None = None) -> dict:
+    """Decode an uploaded recording in memory and transcribe it. Raises NoSpeechError for silent clips"""
+    try:
+        data = file.file.read()
+
+        # Validate uploaded file
+        if not data:
+            raise HTTPException(status_code=400, detail="Uploaded audio file is empty")
+
+        print(f"[STT] Received audio: {len(data)} bytes")
+        STT_UPLOAD_BYTES.observe(len(data))
+
+        # Decode straight to 16 kHz mono samples, ffmpeg temp files only as a fallback
+        try:
+            with AUDIO_DECODE_SECONDS.time():
+                audio = decode_audio(data, temp_dir=TEMP_DIR)
+        except AudioDecodeError as e:
+            print(f"[STT] Decode error: {e}")
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Audio conversion failed: {str(e)[:200]}"
+            )
+
+        duration = round(len(audio) / SAMPLE_RATE, 2)
+        print(f"[STT] Decoded audio: {duration:.2f}s")
+
+        # Drop silence before it reaches the model; silent clips never touch it
+        if VAD_ENABLED:
+            try:
+                audio, vad = trim_silence(audio, max_pause_ms=VAD_MAX_PAUSE_MS)
+            except NoSpeechError:
+                print(f"[STT] No speech in {duration:.2f}s clip")
+                raise
+            print(f"[STT] VAD trimmed {vad['original_duration']:.2f}s -> {vad['trimmed_duration']:.2f}s")
+
+        # Transcribe
+        try:
+            with STT_SECONDS.time():
+                result = stt_batcher.transcribe(audio, options or stt_options())
+            result["duration"] = duration
+            result["speech_duration"] = round(len(audio) / SAMPLE_RATE, 2)
+            print(f"[STT] Transcription: '{result['text'][:50]}...' ({result['language']})")
+        except PoolBusyError:
+            raise
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            print(f"[STT] Transcription error: {e}")
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Transcription failed: {str(e)}"
+            )
+        
+        return result
+        
+    except (HTTPException, PoolBusyError, NoSpeechError):
+        raise
+    except Exception as e:
+        print(f"[STT] Unexpected error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def synthesize_speech(text: str) -> bytes:
+    """Synthesize text to WAV audio and return the raw bytes"""
+    cache_key = tts_cache.key(text, TTS_MODEL)
+    audio_data = tts_cache.get(cache_key)
+    if audio_data is not None:
+        print(f"[TTS] Cache hit: {len(audio_data)} bytes")
+        TTS_OUTPUT_BYTES.observe(len(audio_data))
+        return audio_data
+
+    output_path = TEMP_DIR / f"{uuid.uuid4()}.wav"
+
+    try:
+        print(f"[TTS] Generating speech for: '{text[:50]}...'")
+        
+        # Coqui TTS generates the file directly
+        with TTS_SECONDS.time():
+            tts_pool.call("synthesize", text, str(output_path))
+        
+        if not output_path.exists():
+            raise HTTPException(
+                status_code=500, 
+                detail="TTS failed to create audio file"
+            )
+        
+        file_size = output_path.stat().st_size
+        if file_size == 0:
+            raise HTTPException(
+                status_code=500, 
+                detail="TTS created empty audio file"
+            )
+        
+        print(f"[TTS] Generated audio: {file_size} bytes")
+        
+        with open(output_path, 'rb') as f:
+            audio_data = f.read()
+        
+        output_path.unlink()
+        print(f"[TTS] Cleaned up temp file: {output_path.name}")
+        
+        tts_cache.put(cache_key, audio_data)
+        TTS_OUTPUT_BYTES.observe(len(audio_data))
+        return audio_data
+        
+    except (HTTPException, PoolBusyError):
+        raise
+    except Exception as e:
+        print(f"[TTS] Error: {e}")
+        if output_path.exists():
+            try:
+                output_path.unlink()
+            except:
+                pass
+        raise HTTPException(status_code=500, detail=f"TTS failed: {str(e)}")
+
+# Opus bitrate for compressed speech; 24-32k is transparent for a single voice
+TTS_OPUS_BITRATE = os.environ.get("TTS_OPUS_BITRATE", "32k")
+
+def negotiate_audio_format(accept: str | None) -> str:
+    """Pick an output format from an Accept header, honouring q-values; wav by default"""
+    best, best_q = "wav", 0.0
+    for part in (accept or "").split(","):
+        media_type, _, params = part.strip().partition(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+
+        if media_type in ("audio/ogg", "audio/opus"):
+            fmt = "opus"
+        elif media_type in ("audio/wav", "audio/x-wav", "audio/wave"):
+            fmt = "wav"
+        else:
+            continue
+
+        if q > best_q:
+            best, best_q = fmt, q
+    return best
+
+def synthesize_sentence(text: str) -> bytes:
+    """In-memory synthesis for streamed sentences, served from the cache when possible"""
+    cache_key = tts_cache.key(text, TTS_MODEL)
+    audio_data = tts_cache.get(cache_key)
+    if audio_data is None:
+        with TTS_SECONDS.time():
+            audio_data = tts_pool.call("synthesize_to_bytes", text)
+        tts_cache.put(cache_key, audio_data)
+    TTS_OUTPUT_BYTES.observe(len(audio_data))
+    return audio_data
+
+# How many synthesized sentences may wait ahead of the client in a TTS stream
+TTS_STREAM_AHEAD = int(os.environ.get("TTS_STREAM_AHEAD", 2))
+
+def stream_speech_frames(text: str):
+    """
+    Yield one length-prefixed WAV frame per sentence (4-byte big-endian size,
+    then the WAV bytes). A producer thread keeps synthesizing the next
+    sentences while earlier frames are being sent and played.
+
+    The 200 status is sent before synthesis starts, so a failure mid-stream
+    ends it with an error frame instead: the same framing around a JSON
+    object {"error": ..., "status": ...} rather than a WAV ("{" not "RIFF").
+    """
+    sentences = split_sentences(text)
+    frames = queue.Queue(maxsize=TTS_STREAM_AHEAD)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        error = None
+        try:
+            for index, sentence in enumerate(sentences):
+                if stop.is_set():
+                    return
+                started = time.perf_counter()
+                audio_data = synthesize_sentence(sentence)
+                print(f"[TTS] Stream sentence {index + 1}/{len(sentences)}: {len(audio_data)} bytes in {elapsed_ms(started)}ms")
+                frames.put(audio_data)
+        except PoolBusyError as e:
+            print(f"[TTS] Stream stopped, workers busy: {e}")
+            error = {"error": str(e), "status": 503}
+        except Exception as e:
+            print(f"[TTS] Stream error: {e}")
+            error = {"error": f"Synthesis failed: {e}", "status": 500}
+        finally:
+            if not stop.is_set():
+                if error:
+                    frames.put(json.dumps(error).encode())
+                frames.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            frame = frames.get()
+            if frame is done:
+                return
+            yield struct.pack(">I", len(frame)) + frame
+    finally:
+        # Client went away - stop synthesizing and unblock the producer
+        stop.set()
+        while not frames.empty():
+            frames.get_nowait()
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_query_events(user_prompt: str, system_prompt: str, session_key: str | None = None):
+    """
+    Server-sent events for a streamed LLM reply:
+    "delta" per text chunk, "sentence" whenever a sentence is complete
+    (so TTS can start early), then "done" with the full reply and timings.
+    """
+    started = time.perf_counter()
+    first_token_ms = None
+    parts = []
+    sentences = SentenceBuffer()
+
+    try:
+        for delta in llm.generate_stream(
+            user_prompt=user_prompt,
+            system_prompt=system_prompt,
+            history=conversation_memory.history(session_key) if session_key else None,
+        ):
+            if first_token_ms is None:
+                first_token_ms = elapsed_ms(started)
+                LLM_FIRST_TOKEN_SECONDS.observe(first_token_ms / 1000)
+            parts.append(delta)
+            yield sse_event("delta", {"text": delta})
+
+            for sentence in sentences.feed(delta):
+                yield sse_event("sentence", {"text": sentence})
+
+        for sentence in sentences.flush():
+            yield sse_event("sentence", {"text": sentence})
+
+        total_ms = elapsed_ms(started)
+        LLM_STREAM_SECONDS.observe(total_ms / 1000)
+        response = "".join(parts).strip()
+        print(f"[LLM] Streamed reply: ttft={first_token_ms}ms total={total_ms}ms")
+        yield sse_event("done", {
+            "response": response,
+            "ttft_ms": first_token_ms,
+            "total_ms": total_ms
+        })
+
+        # After "done" so a summary fold never delays the reply
+        if session_key:
+            conversation_memory.record(session_key, user_prompt, response)
+    except Exception as e:
+        print(f"[LLM] Stream error: {e}")
+        yield sse_event("error", {"detail": str(e)})
+
+# routes
+@app.get("/", response_class=HTMLResponse)
+def read_root(request: Request):
+    return FileResponse("templates/index.html")
+
+@app.get("/auth", response_class=HTMLResponse)
+def read_auth_page(request: Request):
+    return FileResponse("templates/login.html")
+
+@app.get("/chose_topics", response_class=HTMLResponse)
+def read_topics_page(request: Request):
+    return FileResponse("templates/topics.html")
+
+@app.get("/room/{topic_id}", response_class=HTMLResponse)
+def read_room(request: Request, topic_id: str):
+    # Verify topic exists
+    topic = get_topic(topic_id)
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return FileResponse("templates/room.html")
+
+@app.get("/chat/{topic_id}", response_class=HTMLResponse)
+def read_chat_room(request: Request, topic_id: str):
+    # Verify topic exists
+    topic = get_topic(topic_id)
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return FileResponse("templates/chat_room.html")
+
+# Auth endpoints
+@app.post("/api/signup", response_model=AuthResponse)
+def signup(payload: SignupRequest):
+    """Create a new user account"""
+    # Validate input
+    if len(payload.password) < 6:
+        raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
+    
+    if len(payload.name.strip()) < 2:
+        raise HTTPException(status_code=400, detail="Name must be at least 2 characters")
+    
+    # Check if user already exists
+    existing_user = get_user_by_email(payload.email)
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    # Create user
+    user = create_user(payload.name.strip(), payload.email, payload.password)
+    
+    if not user:
+        raise HTTPException(status_code=500, detail="Failed to create user")
+    
+    # Create session
+    token = create_session(user["id"])
+    
+    return {
+        "token": token,
+        "user_id": user["id"],
+        "name": user["name"],
+        "email": user["email"]
+    }
+
+@app.post("/api/login", response_model=AuthResponse)
+def login(payload: LoginRequest):
+    """Login user and create session"""
+    # Get user
+    user = get_user_by_email(payload.email)
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    
+    # Verify password
+    if not verify_password(payload.password, user["password_hash"]):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    
+    # Create session
+    token = create_session(user["id"])
+    
+    return {
+        "token": token,
+        "user_id": user["id"],
+        "name": user["name"],
+        "email": user["email"]
+    }
+
+@app.post("/api/logout")
+def logout(user: dict = Depends(get_current_user)):
+    """Logout user and delete session"""
+    # The token is in the Authorization header
+    # We need to get it from the dependency
+    delete_session(user["session_token"])
+    return {"message": "Logged out successfully"}
+
+@app.get("/api/me")
+def get_current_user_info(user: dict = Depends(get_current_user)):
+    """Get current user information"""
+    return {
+        "user_id": user["user_id"],
+        "name": user["name"],
+        "email": user["email"]
+    }
+
+@app.get("/api/topic/{topic_id}")
+def get_topic_info(topic_id: str):
+    """API endpoint to get topic information"""
+    topic = get_topic(topic_id)
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return {
+        "id": topic["id"],
+        "title": topic["title"]
+    }
+
+@app.get("/api/chat/{topic_id}/messages")
+def get_messages(topic_id: str, limit: int = 50, before_id: int | None = None, after_id: int | None = None):
+    """
+    A page of chat messages for a topic: the newest by default, or those
+    before/after a message id. Pass next_cursor back as the same parameter
+    for the following page; it is null once there are no more.
+    """
+    # Include messages still waiting in the write-behind queue
+    chat_writer.flush()
+    try:
+        return get_chat_page(topic_id, limit, before_id, after_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# WebSocket endpoint for real-time chat
+@app.websocket("/ws/chat/{topic_id}")
+async def websocket_chat(websocket: WebSocket, topic_id: str, token: str):
+    # Verify token
+    session = await db_async.get_session(token)
+    if not session:
+        await websocket.close(code=1008, reason="Invalid token")
+        return
+    
+    user_id = session["user_id"]
+    user_name = session["name"]
+    
+    # Verify topic exists
+    topic = await db_async.get_topic(topic_id)
+    if not topic:
+        await websocket.close(code=1008, reason="Topic not found")
+        return
+    
+    await manager.connect(websocket, topic_id, user_id, user_name)
+    
+    try:
+        while True:
+            data = await websocket.receive_json()
+            
+            if data.get("type") == "message":
+                message_text = data.get("message", "").strip()
+                if message_text:
+                    # Save to database
+                    if CHAT_DURABILITY == "direct":
+                        await db_async.save_chat_message(topic_id, user_id, user_name, message_text)
+                    else:
+                        saved = await chat_writer.asubmit(topic_id, user_id, user_name, message_text)
+                        if CHAT_DURABILITY == "commit":
+                            try:
+                                await asyncio.wrap_future(saved)
+                            except Exception as e:
+                                print(f"Failed to save message: {e}")
+                    
+                    # Broadcast to all connected clients
+                    await manager.broadcast(topic_id, {
+                        "type": "message",
+                        "user_id": user_id,
+                        "user_name": user_name,
+                        "message": message_text,
+                        "timestamp": datetime.now().isoformat()
+                    })
+    
+    except WebSocketDisconnect:
+        manager.disconnect(websocket, topic_id)
+        await manager.broadcast(topic_id, {
+            "type": "user_left",
+            "user_name": user_name,
+            "timestamp": datetime.now().isoformat()
+        })
+
+# WebSocket endpoint for incremental speech to text
+@app.websocket("/ws/voice/{topic_id}")
+async def websocket_voice(websocket: WebSocket, topic_id: str, token: str):
+    """
+    Binary frames are audio chunks of the current utterance (MediaRecorder
+    output), a {"type": "end"} text frame closes the utterance. The server
+    pushes {"type": "partial"} results while audio arrives and one
+    {"type": "final"} result per utterance. An utterance longer than
+    VOICE_MAX_BYTES or VOICE_MAX_SECONDS gets its final result, an error
+    and the socket is closed (1009).
+    """
+    # Verify token, as /ws/chat does
+    session = await db_async.get_session(token)
+    if not session:
+        await websocket.close(code=1008, reason="Invalid token")
+        return
+
+    topic = await db_async.get_topic(topic_id)
+    if not topic:
+        await websocket.close(code=1008, reason="Topic not found")
+        return
+
+    if model_state["stt"]["state"] != "ready":
+        # 1013: try again later
+        await websocket.close(code=1013, reason="STT model is not loaded yet")
+        return
+
+    await websocket.accept()
+    stream = VoiceStream(stt_options(topic))
+    partials = asyncio.create_task(stream_partials(websocket, stream))
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes"):
+                stream.append(message["bytes"])
+                if stream.over_limit:
+                    print(f"[STT] Utterance over the limit ({len(stream.data)} bytes, {stream.duration:.1f}s), closing")
+                    await send_final(websocket, stream)
+                    await websocket.send_json({
+                        "type": "error",
+                        "detail": f"Utterance too long (max {VOICE_MAX_SECONDS:.0f}s / {VOICE_MAX_BYTES} bytes)"
+                    })
+                    await websocket.close(code=1009, reason="Utterance too long")
+                    break
+                continue
+
+            try:
+                data = json.loads(message.get("text") or "{}")
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Text frames must be JSON"})
+                continue
+            if not isinstance(data, dict) or data.get("type") != "end":
+                continue
+
+            await send_final(websocket, stream)
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        partials.cancel()
+
+@app.post("/query", response_model=QueryResponse, dependencies=[Depends(requires("llm"))])
+async def query_llm(payload: QueryRequest, background_tasks: BackgroundTasks):
+    """Query the LLM - no auth required for now"""
+    if not payload.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    final_system_prompt = await db_async.run(build_system_prompt, payload.topic_id)
+    session_key = memory_key(payload.topic_id, payload.session_id)
+    # history() waits on the session lock, so keep it off the event loop
+    history = await run_in_threadpool(conversation_memory.history, session_key) if session_key else None
+
+    try:
+        # Awaits Gemini on the event loop instead of holding a threadpool slot
+        result = await agenerate_reply(
+            payload.query,
+            final_system_prompt,
+            payload.topic_id,
+            history=history,
+        )
+        if session_key:
+            # Recorded after the response is sent; may fold old turns into the summary
+            background_tasks.add_task(conversation_memory.record, session_key, payload.query, result)
+        return {"response": result}
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="LLM request timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/query/stream", dependencies=[Depends(requires("llm"))])
+def query_llm_stream(payload: QueryRequest):
+    """Stream the LLM reply as server-sent events - no auth required for now"""
+    if not payload.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    final_system_prompt = build_system_prompt(payload.topic_id)
+
+    return StreamingResponse(
+        stream_query_events(payload.query, final_system_prompt, memory_key(payload.topic_id, payload.session_id)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.post("/speech-to-text", response_model=TranscriptionResponse, dependencies=[Depends(requires("stt"))])
+def speech_to_text(
+    file: UploadFile = File(...),
+    topic_id: str | None = Form(None),
+    language: str | None = Form(None),
+    beam_size: int | None = Form(None),
+    temperature_fallback: bool | None = Form(None),
+    fp16: bool | None = Form(None)
+):
+    """Speech to text conversion - no auth required. Decode options default to the server's STT_* settings"""
+    topic = get_topic(topic_id) if topic_id else None
+    options = stt_options(topic, language, beam_size, temperature_fallback, fp16)
+    try:
+        return transcribe_upload(file, options)
+    except NoSpeechError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/text-to-speech", dependencies=[Depends(requires("tts"))])
+def text_to_speech(payload: TTSRequest, request: Request):
+    """Text to speech conversion - no auth required"""
+    if not payload.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    
+    if len(payload.text) > 5000000:
+        raise HTTPException(status_code=400, detail="Text too long (max 5000000 characters)")
+
+    if payload.format is not None and payload.format not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format, expected one of {sorted(OUTPUT_FORMATS)}"
+        )
+
+    fmt = payload.format or negotiate_audio_format(request.headers.get("accept"))
+    wav_data = synthesize_speech(payload.text)
+
+    try:
+        audio_data = encode_audio(wav_data, fmt, TTS_OPUS_BITRATE)
+    except AudioEncodeError as e:
+        if payload.format:
+            raise HTTPException(status_code=500, detail=str(e))
+        # Only negotiated through Accept - WAV is always playable
+        print(f"[TTS] {fmt} encoding failed, sending wav: {e}")
+        fmt, audio_data = "wav", wav_data
+
+    media_type, extension = OUTPUT_FORMATS[fmt]
+    duration = wav_duration(wav_data)
+
+    return Response(
+        content=audio_data,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename=speech.{extension}",
+            "Content-Length": str(len(audio_data)),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept",
+            "X-Audio-Format": fmt,
+            "X-Audio-Bytes": str(len(audio_data)),
+            "X-Audio-Duration": f"{duration:.2f}",
+            "X-Audio-Bitrate-Kbps": f"{len(audio_data) * 8 / 1000 / duration:.1f}" if duration else "0",
+        }
+    )
+
+@app.post("/text-to-speech/stream", dependencies=[Depends(requires("tts"))])
+def text_to_speech_stream(payload: TTSRequest):
+    """Sentence-by-sentence text to speech as length-prefixed WAV frames - no auth required"""
+    if not payload.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    
+    if len(payload.text) > 5000000:
+        raise HTTPException(status_code=400, detail="Text too long (max 5000000 characters)")
+
+    return StreamingResponse(
+        stream_speech_frames(payload.text),
+        media_type="application/octet-stream",
+        headers={
+            "X-Audio-Framing": "length-prefixed; format=wav; errors=json",
+            "Cache-Control": "no-cache"
+        }
+    )
+
+@app.post("/voice-turn", response_model=VoiceTurnResponse, dependencies=[Depends(requires("stt", "llm", "tts"))])
+def voice_turn(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    topic_id: str = Form(...),
+    session_id: str | None = Form(None)
+):
+    """Run a full debate turn (STT -> LLM -> TTS) in a single round trip"""
+    # Fail fast on an unknown topic before doing any model work
+    final_system_prompt = build_system_prompt(topic_id)
+    session_key = memory_key(topic_id, session_id)
+
+    timings = {}
+    turn_started = time.perf_counter()
+
+    started = time.perf_counter()
+    try:
+        transcription = transcribe_upload(file, stt_options(get_topic(topic_id)))
+    except NoSpeechError:
+        transcription = {"text": "", "language": None}
+    timings["stt_ms"] = elapsed_ms(started)
+
+    # Nothing was said - let the client go back to listening
+    if not transcription["text"]:
+        timings["total_ms"] = elapsed_ms(turn_started)
+        return {
+            "transcript": "",
+            "language": transcription["language"],
+            "response": "",
+            "audio": None,
+            "timings": timings
+        }
+
+    started = time.perf_counter()
+    try:
+        reply = generate_reply(
+            transcription["text"],
+            final_system_prompt,
+            topic_id,
+            history=conversation_memory.history(session_key) if session_key else None,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    timings["llm_ms"] = elapsed_ms(started)
+
+    if session_key:
+        background_tasks.add_task(conversation_memory.record, session_key, transcription["text"], reply)
+
+    started = time.perf_counter()
+    audio_data = synthesize_speech(reply)
+    timings["tts_ms"] = elapsed_ms(started)
+
+    timings["total_ms"] = elapsed_ms(turn_started)
+    print(f"[TURN] {topic_id}: stt={timings['stt_ms']}ms llm={timings['llm_ms']}ms tts={timings['tts_ms']}ms")
+
+    return {
+        "transcript": transcription["text"],
+        "language": transcription["language"],
+        "response": reply,
+        "audio": base64.b64encode(audio_data).decode("ascii"),
+        "timings": timings
+    }
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Hit/miss counters and sizes of the server-side caches"""
+    return {
+        "tts": tts_cache.stats(),
+        "llm": llm_cache.stats(),
+        "sessions": session_cache.stats()
+    }
+
+@app.get("/ready")
+def readiness_check():
+    """Per-model load state; 200 once every model is loaded"""
+    ready = all(state["state"] == "ready" for state in model_state.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": model_state}
+    )
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format; everything is pre-aggregated, scraping only formats it"""
+    return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/live")
+def liveness_check():
+    """The process is up and serving - never touches models, the DB or Gemini"""
+    return {"status": "alive"}
+
+@app.get("/health")
+def health_check():
+    """Last background probe results (see HEALTH_*_INTERVAL); answers without probing anything"""
+    health = health_prober.snapshot()
+    health["models"] = model_state
+    health["workers"] = {
+        "stt": stt_pool.stats(),
+        "tts": tts_pool.stats(),
+        "stt_batching": stt_batcher.stats(),
+        "chat_writer": chat_writer.stats(),
+        "llm": llm.stats() if llm is not None else None
+    }
+
+    return health
+
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 8080))
     uvicorn.run("app:app", host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+Benchmark Modules.db: ops/sec for get_session, save_chat_message and
+get_chat_messages with a connection per call (the old behaviour, DB_POOL=0)
+and with pooled WAL connections.
+
+Runs against a throwaway database, never data.db. Each operation is timed
+single-threaded and with --threads threads, since WAL mostly pays off when
+readers and writers overlap.
+
+Usage (from the project root):
+    python scripts/bench_db.py
+    python scripts/bench_db.py --seconds 3 --threads 8 --messages 5000
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Modules import db
+
+OPERATIONS = ("get_session", "save_chat_message", "get_chat_messages")
+
+
+def setup(path: Path, messages: int) -> str:
+    db.DB_PATH = path
+    db.init_db()
+    db.add_topic("bench", "Bench", "You are a benchmark.")
+    user = db.create_user("Bench User", "bench@example.com", "bench-password")
+    token = db.create_session(user["id"])
+    for index in range(messages):
+        db.save_chat_message("bench", user["id"], user["name"], f"Seed message {index}")
+    return token
+
+
+def operation(name: str, token: str, user_id: str):
+    if name == "get_session":
+        return lambda: db.get_session(token)
+    if name == "save_chat_message":
+        return lambda: db.save_chat_message("bench", user_id, "Bench User", "A benchmark message")
+    return lambda: db.get_chat_messages("bench", 50)
+
+
+def run(call, seconds: float, threads: int) -> float:
+    """Total calls per second over all threads"""
+    counts = [0] * threads
+    stop = threading.Event()
+
+    def worker(index: int):
+        while not stop.is_set():
+            call()
+            counts[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def bench(pooled: bool, args) -> dict:
+    db.close_connections()
+    db.POOL_CONNECTIONS = pooled
+    # Time the database itself - with the session cache on, get_session never reaches it
+    db.session_cache.ttl = 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        token = setup(Path(directory) / "bench.db", args.messages)
+        user_id = db.get_session(token)["user_id"]
+
+        results = {}
+        for name in OPERATIONS:
+            call = operation(name, token, user_id)
+            results[name] = (run(call, args.seconds, 1), run(call, args.seconds, args.threads))
+        # Release the file before the directory is removed
+        db.close_connections()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2, help="per operation and thread count")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=2000, help="chat messages seeded before timing")
+    args = parser.parse_args()
+
+    before = bench(False, args)
+    after = bench(True, args)
+
+    print(f"\n{'operation':<20} {'threads':>7} {'per call':>11} {'pooled WAL':>11} {'speedup':>8}")
+    for name in OPERATIONS:
+        for column, threads in enumerate((1, args.threads)):
+            old, new = before[name][column], after[name][column]
+            print(f"{name:<20} {threads:>7} {old:>9.0f}/s {new:>9.0f}/s {new / old:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
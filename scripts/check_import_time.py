@@ -0,0 +1,67 @@
+"""
+Check that importing the app stays cheap.
+
+Models (Whisper, Coqui, Gemini client) load in the background after startup,
+so `import app` should only pull in FastAPI and the light modules. This times
+the import in a fresh interpreter and fails when it goes over the budget.
+
+Usage (from the project root):
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget 1.5 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def time_import(module: str) -> tuple[float, str]:
+    """Import the module in a fresh interpreter with -X importtime; returns (seconds, importtime log)"""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - started
+
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return elapsed, result.stderr
+
+
+def slowest_imports(log: str, top: int) -> list[tuple[int, str]]:
+    """Parse `-X importtime` lines into (cumulative us, module), slowest first"""
+    rows = []
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget", type=float, default=2.0, help="max seconds for the import")
+    parser.add_argument("--top", type=int, default=10, help="show the N slowest imports")
+    args = parser.parse_args()
+
+    elapsed, log = time_import(args.module)
+
+    print(f"import {args.module}: {elapsed:.2f}s (budget {args.budget:.2f}s)")
+    for cumulative, name in slowest_imports(log, args.top):
+        print(f"  {cumulative / 1e6:>7.3f}s {name}")
+
+    if elapsed > args.budget:
+        print("FAIL: over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
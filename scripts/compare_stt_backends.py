@@ -0,0 +1,155 @@
+"""
+Compare speech-recognition backends on accuracy and latency.
+
+Runs every backend over the same local WAV fixtures and prints word error
+rate (when a reference transcript exists) and latency per backend.
+
+Fixture layout - one reference transcript per clip, same stem:
+    fixtures/stt/ubi_rebuttal.wav
+    fixtures/stt/ubi_rebuttal.txt
+
+The reference transcripts are committed; the clips are read from them by
+the project's TTS model with scripts/make_stt_fixtures.py. Real recordings
+can be added the same way, a .wav with its .txt.
+
+faster-whisper is optional (pip install -r requirements-optional.txt);
+backends that are not installed are skipped.
+
+Usage (from the project root):
+    python scripts/make_stt_fixtures.py
+    python scripts/compare_stt_backends.py
+    python scripts/compare_stt_backends.py --fixtures path/to/wavs --backends whisper faster-whisper --model base
+    python scripts/compare_stt_backends.py --language en --no-fallback   # pinned language, no retries
+"""
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Modules.audio import SAMPLE_RATE, decode_audio
+from Modules.sr import BACKENDS, SpeechRecognizer, transcribe_options
+
+
+def normalize_words(text: str) -> list[str]:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference: str, hypothesis: str) -> tuple[int, int]:
+    """Word-level Levenshtein distance and reference length"""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            ))
+        previous = current
+
+    return previous[-1], len(ref)
+
+
+def load_fixtures(directory: Path) -> list[tuple[str, object, str | None]]:
+    fixtures = []
+    for wav_path in sorted(directory.glob("*.wav")):
+        audio = decode_audio(wav_path.read_bytes())
+        reference_path = wav_path.with_suffix(".txt")
+        reference = reference_path.read_text(encoding="utf-8").strip() if reference_path.exists() else None
+        fixtures.append((wav_path.name, audio, reference))
+    return fixtures
+
+
+def run_backend(backend: str, model_size: str, fixtures: list, warmup: bool, options: dict) -> dict:
+    load_started = time.perf_counter()
+    recognizer = SpeechRecognizer(model_size=model_size, backend=backend)
+    load_seconds = time.perf_counter() - load_started
+
+    if warmup and fixtures:
+        recognizer.transcribe(fixtures[0][1], options)
+
+    latencies = []
+    errors = 0
+    reference_words = 0
+    audio_seconds = 0.0
+
+    for name, audio, reference in fixtures:
+        started = time.perf_counter()
+        result = recognizer.transcribe(audio, options)
+        elapsed = time.perf_counter() - started
+
+        latencies.append(elapsed)
+        audio_seconds += len(audio) / SAMPLE_RATE
+
+        line = f"  [{backend}] {name}: {elapsed * 1000:.0f}ms '{result['text'][:60]}'"
+        if reference is not None:
+            clip_errors, clip_words = word_errors(reference, result["text"])
+            errors += clip_errors
+            reference_words += clip_words
+            line += f" (WER {clip_errors / max(1, clip_words):.1%})"
+        print(line)
+
+    return {
+        "backend": backend,
+        "load_s": load_seconds,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "rtf": sum(latencies) / audio_seconds if audio_seconds else None,
+        "wer": errors / reference_words if reference_words else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=Path("fixtures/stt"), help="directory of .wav (+ .txt) fixtures")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--model", default="base", help="model size passed to every backend")
+    parser.add_argument("--no-warmup", action="store_true", help="include the first (cold) call in the timings")
+    parser.add_argument("--language", help="pin the language instead of detecting it per clip")
+    parser.add_argument("--beam-size", type=int, help="beam search width (default: greedy)")
+    parser.add_argument("--no-fallback", action="store_true", help="disable temperature-fallback retries")
+    parser.add_argument("--prompt", help="initial prompt, e.g. 'A debate about Universal Basic Income.'")
+    args = parser.parse_args()
+
+    options = transcribe_options(
+        language=args.language,
+        beam_size=args.beam_size,
+        temperature_fallback=not args.no_fallback,
+        initial_prompt=args.prompt,
+    )
+
+    if not args.fixtures.is_dir():
+        parser.error(f"fixture directory not found: {args.fixtures}")
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        parser.error(f"no .wav files in {args.fixtures} - generate them with python scripts/make_stt_fixtures.py")
+
+    total_audio = sum(len(audio) for _, audio, _ in fixtures) / SAMPLE_RATE
+    print(f"{len(fixtures)} fixtures, {total_audio:.1f}s of audio, model '{args.model}', options {options}\n")
+
+    rows = []
+    for backend in args.backends:
+        try:
+            rows.append(run_backend(backend, args.model, fixtures, warmup=not args.no_warmup, options=options))
+        except ImportError as e:
+            print(f"  [{backend}] skipped - not installed ({e})")
+
+    print(f"\n{'backend':<16}{'load s':>8}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}{'RTF':>8}{'WER':>8}")
+    for row in rows:
+        rtf = f"{row['rtf']:.3f}" if row["rtf"] is not None else "-"
+        wer = f"{row['wer']:.1%}" if row["wer"] is not None else "-"
+        print(f"{row['backend']:<16}{row['load_s']:>8.1f}{row['mean_ms']:>10.0f}{row['p50_ms']:>10.0f}"
+              f"{row['max_ms']:>10.0f}{rtf:>8}{wer:>8}")
+
+
+if __name__ == "__main__":
+    main()
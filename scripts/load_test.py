@@ -0,0 +1,346 @@
+"""
+End-to-end load test: N simulated users against a running server.
+
+Each user signs up, joins the topic's chat room over /ws/chat and then loops
+until the duration is up: upload a clip to /speech-to-text, ask /query, have
+the reply read by /text-to-speech and post a chat message, timing until its
+broadcast comes back. Prints count, errors, p50/p95/p99 and throughput per
+endpoint.
+
+--spawn starts its own server with the deterministic stub engines from
+scripts/stub_engines.py, so results measure the app (batching, pools,
+caches, the database) rather than the models or the network. Their latency
+is set with the STUB_* variables. Users sign up like real ones, in a
+throwaway database rather than data.db (DB_PATH overrides it).
+
+Baselines - save a run, then fail later runs (exit 1) whose p95 rose or
+throughput fell by more than --tolerance:
+    python scripts/load_test.py --spawn --users 20 --duration 30 --save-baseline load_baseline.json
+    python scripts/load_test.py --spawn --users 20 --duration 30 --baseline load_baseline.json
+
+Usage (from the project root):
+    python scripts/load_test.py --spawn --users 10 --duration 20
+    python scripts/load_test.py --url http://127.0.0.1:8000 --users 5 --endpoints query chat
+    STUB_LLM_MS=800 STUB_STT_MS=300 python scripts/load_test.py --spawn
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+import numpy as np
+import websockets
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from Modules.audio import SAMPLE_RATE, float_to_wav_bytes
+
+ENDPOINTS = ("stt", "query", "tts", "chat")
+STUB_ENGINES = {
+    "STT_ENGINE": "scripts.stub_engines:StubSpeechRecognizer",
+    "TTS_ENGINE": "scripts.stub_engines:StubTextToSpeech",
+    "LLM_ENGINE": "scripts.stub_engines:StubLLM",
+}
+QUERIES = [
+    "A carbon tax is the cheapest way to cut emissions",
+    "Universal basic income would reduce the incentive to work",
+    "Nuclear power has to be part of any serious climate plan",
+    "Remote work makes teams less productive over time",
+]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+
+    def record(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def summary(self, elapsed: float) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "count": len(ordered),
+            "errors": self.errors,
+            "p50_ms": percentile(ordered, 0.50),
+            "p95_ms": percentile(ordered, 0.95),
+            "p99_ms": percentile(ordered, 0.99),
+            "rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class Finish:
+    """
+    Users keep their sockets open until every user is done, so the last
+    turns are not slowed by rooms broadcasting to sockets that are closing
+    """
+    def __init__(self, users: int):
+        self.remaining = users
+        self.event = asyncio.Event()
+        self.finished_at = None
+
+    def done(self):
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.finished_at = time.monotonic()
+            self.event.set()
+
+
+def percentile(ordered: list[float], q: float) -> float | None:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+
+def make_clip(seconds: float) -> bytes:
+    """A speech-length 16 kHz WAV - parsed in-process by the server, no ffmpeg needed"""
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    # Rises and falls ~4 times a second like syllables, so the server's VAD keeps it as speech
+    syllables = np.abs(np.sin(2 * np.pi * 2 * t))
+    return float_to_wav_bytes(0.4 * syllables * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(t.size), SAMPLE_RATE)
+
+
+async def timed(stats: EndpointStats, request):
+    started = time.perf_counter()
+    try:
+        result = await request
+    except Exception as e:
+        stats.errors += 1
+        print(f"[LOAD] {type(e).__name__}: {str(e)[:120]}")
+        return None
+    stats.record(time.perf_counter() - started)
+    return result
+
+
+async def checked(request):
+    response = await request
+    response.raise_for_status()
+    return response
+
+
+async def chat_round_trip(websocket, marker: str):
+    await websocket.send(json.dumps({"type": "message", "message": marker}))
+    # Other users' broadcasts arrive on the same socket - wait for our own
+    while True:
+        event = json.loads(await websocket.recv())
+        if event.get("type") == "message" and event.get("message") == marker:
+            return event
+
+
+async def run_user(index: int, client: httpx.AsyncClient, args, clip: bytes, stats: dict, deadline: float,
+                   finish: Finish):
+    counted = False
+    try:
+        await user_turns(index, client, args, clip, stats, deadline, finish)
+        counted = True
+    finally:
+        if not counted:
+            finish.done()
+
+
+async def user_turns(index: int, client: httpx.AsyncClient, args, clip: bytes, stats: dict, deadline: float,
+                     finish: Finish):
+    response = await client.post("/api/signup", json={
+        "name": f"Load user {index}",
+        "email": f"load-{uuid.uuid4().hex[:12]}@example.com",
+        "password": "load-test",
+    })
+    response.raise_for_status()
+    token = response.json()["token"]
+
+    ws_url = str(client.base_url).replace("http", "ws", 1).rstrip("/") + f"/ws/chat/{args.topic}?token={token}"
+    session_id = str(uuid.uuid4())
+    turn = 0
+
+    async with websockets.connect(ws_url) as websocket:
+        while time.monotonic() < deadline:
+            turn += 1
+            reply = None
+
+            if "stt" in args.endpoints:
+                await timed(stats["stt"], checked(client.post(
+                    "/speech-to-text",
+                    files={"file": ("clip.wav", clip, "audio/wav")},
+                    data={"topic_id": args.topic},
+                )))
+
+            if "query" in args.endpoints:
+                # Distinct per user and turn, so the reply cache does not answer everything
+                query = f"{QUERIES[(index + turn) % len(QUERIES)]} (user {index}, turn {turn})"
+                response = await timed(stats["query"], checked(client.post(
+                    "/query", json={"query": query, "topic_id": args.topic, "session_id": session_id},
+                )))
+                if response is not None:
+                    reply = response.json()["response"]
+
+            if "tts" in args.endpoints:
+                text = f"{reply or QUERIES[0]} Turn {turn} of user {index}."
+                await timed(stats["tts"], checked(client.post("/text-to-speech", json={"text": text, "format": "wav"})))
+
+            if "chat" in args.endpoints:
+                marker = f"user {index} turn {turn} {uuid.uuid4().hex[:8]}"
+                await timed(stats["chat"], asyncio.wait_for(chat_round_trip(websocket, marker), args.timeout))
+
+            if args.think:
+                await asyncio.sleep(args.think / 1000)
+
+        finish.done()
+        await finish.event.wait()
+
+
+async def run_load(base_url: str, args) -> tuple[dict, float]:
+    stats = {name: EndpointStats() for name in args.endpoints}
+    clip = make_clip(args.clip_seconds)
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.monotonic()
+        deadline = started + args.duration
+        finish = Finish(args.users)
+        users = []
+        for index in range(args.users):
+            users.append(asyncio.create_task(run_user(index, client, args, clip, stats, deadline, finish)))
+            if args.ramp:
+                await asyncio.sleep(args.ramp / args.users)
+
+        results = await asyncio.gather(*users, return_exceptions=True)
+        elapsed = finish.finished_at - started
+
+    failed = [result for result in results if isinstance(result, Exception)]
+    for error in failed[:3]:
+        print(f"[LOAD] User failed: {type(error).__name__}: {str(error)[:200]}")
+    if failed:
+        print(f"[LOAD] {len(failed)}/{args.users} users stopped early")
+
+    return {name: endpoint.summary(elapsed) for name, endpoint in stats.items()}, elapsed
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    for name, path in STUB_ENGINES.items():
+        env.setdefault(name, path)
+    # Keep stub audio out of the real TTS cache
+    env.setdefault("TTS_CACHE_DIR", tempfile.mkdtemp(prefix="load-tts-cache-"))
+    # ...and the simulated users and their chat out of data.db
+    env.setdefault("DB_PATH", str(Path(tempfile.mkdtemp(prefix="load-db-")) / "load.db"))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+
+    # The app logs every request - keep that out of the report
+    log_path = Path(tempfile.gettempdir()) / "load_test_server.log"
+    print(f"[LOAD] Starting server with stub engines on port {port} (log: {log_path})")
+    with open(log_path, "w") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+
+def wait_ready(base_url: str, server: subprocess.Popen | None, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            response = httpx.get(f"{base_url}/ready", timeout=2)
+        except httpx.TransportError:
+            response = None
+        if response is not None:
+            if response.status_code == 200:
+                return
+            failed = {name: model["error"] for name, model in response.json()["models"].items() if model["state"] == "error"}
+            if failed:
+                raise RuntimeError(f"Models failed to load: {failed}")
+        time.sleep(0.25)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+
+def print_report(results: dict, elapsed: float, users: int):
+    print(f"\n{users} users, {elapsed:.1f}s\n")
+    print(f"{'endpoint':<10} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['count']:>7} {result['errors']:>7} {str(result['p50_ms']):>9} "
+            f"{str(result['p95_ms']):>9} {str(result['p99_ms']):>9} {result['rps']:>8}"
+        )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions against a saved run: p95 up, throughput down or new errors"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+        if before["p95_ms"] and result["p95_ms"] and result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if before["rps"] and result["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['rps']} -> {result['rps']} req/s")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server to test (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="start a server with the stub engines")
+    parser.add_argument("--port", type=int, default=8765, help="port for --spawn")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--ramp", type=float, default=1, help="seconds over which users start")
+    parser.add_argument("--think", type=float, default=0, help="pause between a user's turns, ms")
+    parser.add_argument("--topic", default="climate_action")
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument("--clip-seconds", type=float, default=3, help="length of the uploaded clip")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout, seconds")
+    parser.add_argument("--save-baseline", type=Path, help="write this run's results as a baseline")
+    parser.add_argument("--baseline", type=Path, help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change vs the baseline")
+    args = parser.parse_args()
+
+    server = spawn_server(args.port) if args.spawn else None
+    base_url = f"http://127.0.0.1:{args.port}" if args.spawn else args.url.rstrip("/")
+
+    try:
+        wait_ready(base_url, server, timeout=120)
+        results, elapsed = asyncio.run(run_load(base_url, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print_report(results, elapsed, args.users)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(
+            {"users": args.users, "duration": args.duration, "endpoints": results}, indent=2,
+        ))
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("users") != args.users:
+            print(f"\nNote: baseline ran {baseline.get('users')} users, this run {args.users}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Generate the WAV clips for scripts/compare_stt_backends.py.
+
+Each fixtures/stt/*.txt holds a reference transcript; this reads it aloud
+with the project's Coqui TTS model and writes the clip next to it as a
+16 kHz mono 16-bit WAV (the format the server parses in-process). Clips
+that already exist are kept unless --force is given, so real recordings
+dropped into the directory with their own .txt are never overwritten.
+
+Synthesized speech is cleaner than a microphone, so absolute WER is
+optimistic; it is the comparison between backends that matters. --noise
+mixes in white noise at the given SNR to make the clips harder.
+
+Usage (from the project root):
+    python scripts/make_stt_fixtures.py
+    python scripts/make_stt_fixtures.py --noise 20 --force
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Modules.audio import SAMPLE_RATE, float_to_wav_bytes
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    if source_rate == target_rate:
+        return audio
+    duration = len(audio) / source_rate
+    target = np.arange(int(duration * target_rate)) / target_rate
+    return np.interp(target, np.arange(len(audio)) / source_rate, audio)
+
+
+def add_noise(audio: np.ndarray, snr_db: float, seed: int) -> np.ndarray:
+    power = np.mean(audio ** 2)
+    noise = np.random.default_rng(seed).standard_normal(len(audio))
+    return audio + noise * np.sqrt(power / 10 ** (snr_db / 10))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=Path("fixtures/stt"), help="directory of .txt transcripts")
+    parser.add_argument("--model", default="tts_models/en/ljspeech/tacotron2-DDC", help="Coqui model name")
+    parser.add_argument("--noise", type=float, help="mix in white noise at this SNR (dB)")
+    parser.add_argument("--force", action="store_true", help="regenerate clips that already exist")
+    args = parser.parse_args()
+
+    transcripts = sorted(args.fixtures.glob("*.txt"))
+    pending = [path for path in transcripts if args.force or not path.with_suffix(".wav").exists()]
+    if not pending:
+        print(f"[FIXTURES] Nothing to generate ({len(transcripts)} transcripts in {args.fixtures})")
+        return
+
+    from Modules.tts import TextToSpeech
+    tts = TextToSpeech(args.model)
+    source_rate = tts.tts.synthesizer.output_sample_rate
+
+    for seed, path in enumerate(pending):
+        text = path.read_text(encoding="utf-8").strip()
+        audio = resample(np.asarray(tts.tts.tts(text=text), dtype=np.float32), source_rate, SAMPLE_RATE)
+        if args.noise is not None:
+            audio = add_noise(audio, args.noise, seed)
+        path.with_suffix(".wav").write_bytes(float_to_wav_bytes(audio, SAMPLE_RATE))
+        print(f"[FIXTURES] {path.with_suffix('.wav').name}: {len(audio) / SAMPLE_RATE:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
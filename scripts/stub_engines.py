@@ -0,0 +1,107 @@
+"""
+Deterministic stand-ins for the model engines, for load testing offline
+and without a GPU. They keep the real classes' interfaces and sleep for a
+configurable time instead of running a model.
+
+Selected with "module:Class" paths (see scripts/load_test.py):
+    STT_ENGINE=scripts.stub_engines:StubSpeechRecognizer
+    TTS_ENGINE=scripts.stub_engines:StubTextToSpeech
+    LLM_ENGINE=scripts.stub_engines:StubLLM
+
+Latency knobs (milliseconds):
+    STUB_STT_MS             per clip, plus STUB_STT_MS_PER_SECOND of audio
+    STUB_STT_BATCH_MS       extra per additional clip in a batch
+    STUB_LLM_MS             per reply (STUB_LLM_TTFT_MS until the first streamed chunk)
+    STUB_TTS_MS_PER_CHAR    per character synthesized
+"""
+import asyncio
+import os
+import time
+import numpy as np
+from Modules.audio import float_to_wav_bytes
+
+TTS_SAMPLE_RATE = 22050
+REPLY = (
+    "That argument overlooks the cost of implementation. "
+    "Evidence from pilot programs is limited and may not scale. "
+    "What would you cut to pay for it?"
+)
+
+
+def _ms(name: str, default: float) -> float:
+    return float(os.environ.get(name, default)) / 1000
+
+
+class StubSpeechRecognizer:
+    def __init__(self, model_size: str = "base", backend: str | None = None):
+        self.backend_name = "stub"
+        self.model = None
+        self.per_clip = _ms("STUB_STT_MS", 150)
+        self.per_second = _ms("STUB_STT_MS_PER_SECOND", 20)
+        self.per_batch_item = _ms("STUB_STT_BATCH_MS", 30)
+
+    def _text(self, audio) -> dict:
+        seconds = len(audio) / 16000 if isinstance(audio, np.ndarray) else 0.0
+        return {"text": f"I think the evidence is clear after {seconds:.1f} seconds.", "language": "en"}
+
+    def transcribe(self, audio, options: dict | None = None) -> dict:
+        seconds = len(audio) / 16000 if isinstance(audio, np.ndarray) else 1.0
+        time.sleep(self.per_clip + self.per_second * seconds)
+        return self._text(audio)
+
+    def transcribe_batch(self, audios: list, options: dict | None = None) -> list[dict]:
+        # A batched pass costs one clip plus a little per extra clip, like Whisper's
+        seconds = max((len(audio) / 16000 for audio in audios), default=0.0)
+        time.sleep(self.per_clip + self.per_second * seconds + self.per_batch_item * (len(audios) - 1))
+        return [self._text(audio) for audio in audios]
+
+
+class StubTextToSpeech:
+    def __init__(self, model_name: str = "stub"):
+        self.model_name = model_name
+        self.speaker = None
+        self.per_char = _ms("STUB_TTS_MS_PER_CHAR", 2)
+
+    def synthesize_to_bytes(self, text: str) -> bytes:
+        time.sleep(self.per_char * len(text))
+        # ~70 ms of audio per character, like natural speech
+        samples = int(TTS_SAMPLE_RATE * 0.07 * max(1, len(text)))
+        t = np.arange(samples) / TTS_SAMPLE_RATE
+        return float_to_wav_bytes(0.3 * np.sin(2 * np.pi * 180 * t), TTS_SAMPLE_RATE)
+
+    def synthesize(self, text: str, output_path: str) -> str:
+        with open(output_path, "wb") as f:
+            f.write(self.synthesize_to_bytes(text))
+        return output_path
+
+
+class StubLLM:
+    def __init__(self):
+        self.model = "stub"
+        self.temperature = 0.0
+        self.latency = _ms("STUB_LLM_MS", 400)
+        self.first_token = _ms("STUB_LLM_TTFT_MS", 150)
+
+    def generate(self, user_prompt: str, system_prompt: str | None = None, history: list[dict] | None = None) -> str:
+        time.sleep(self.latency)
+        return REPLY
+
+    def generate_stream(self, user_prompt: str, system_prompt: str | None = None, history: list[dict] | None = None):
+        time.sleep(self.first_token)
+        sentences = REPLY.split(". ")
+        rest = max(0.0, self.latency - self.first_token) / max(1, len(sentences) - 1)
+        for index, sentence in enumerate(sentences):
+            if index:
+                time.sleep(rest)
+            yield sentence + (". " if index < len(sentences) - 1 else "")
+
+    async def agenerate(self, user_prompt: str, system_prompt: str | None = None,
+                        history: list[dict] | None = None) -> str:
+        await asyncio.sleep(self.latency)
+        return REPLY
+
+    def ping(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"engine": "stub"}
@@ -0,0 +1,231 @@
+"""
+Local stand-in for the Gemini API, for load and failure testing without
+spending quota.
+
+Answers generateContent and streamGenerateContent with a canned reply after
+a configurable latency. A fraction of requests can be made slow (to exercise
+hedging) or fail with a 503 (to exercise retries). cachedContents can be
+created, refreshed and referenced like the real context-cache API; their
+tokens are reported as cachedContentTokenCount and cost no latency.
+
+Usage (from the project root):
+    python scripts/stub_gemini.py --port 8089 --latency 300 --slow-rate 0.05 --error-rate 0.02
+    GEMINI_BASE_URL=http://127.0.0.1:8089 GEMINI_API_KEY=stub python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "That claim ignores the costs. Pilot programs were small, short and not representative of a national rollout."
+
+
+def _tokens(data) -> int:
+    # Rough count, ~4 characters per token
+    return len(json.dumps(data)) // 4 if data else 0
+
+
+def _ttl_seconds(ttl: str | None) -> float:
+    return float(ttl.rstrip("s")) if ttl else 3600.0
+
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+    counter = 0
+    counter_lock = threading.Lock()
+    # cachedContents/<id> -> {"body": create request, "expires_at": monotonic time}
+    caches = {}
+
+    def do_POST(self):
+        body = self._read_json()
+
+        if re.search(r"/cachedContents$", self.path.split("?")[0]):
+            self._create_cache(body)
+            return
+
+        match = re.search(r"/models/([^/:]+):(generateContent|streamGenerateContent)", self.path)
+        if not match:
+            self._send_error(404, "Not found", "NOT_FOUND")
+            return
+
+        with StubGeminiHandler.counter_lock:
+            StubGeminiHandler.counter += 1
+
+        cached_tokens = 0
+        if body.get("cachedContent"):
+            cache = self._get_cache(body["cachedContent"])
+            if cache is None:
+                self._send_error(403, "CachedContent not found (or permission denied)", "PERMISSION_DENIED")
+                return
+            cached_tokens = _tokens(cache["body"].get("systemInstruction"))
+
+        config = self.config
+        # Uncached prompt tokens cost latency, like prefill on the real service
+        latency = random.gauss(config.latency, config.jitter) / 1000
+        latency += _tokens(body.get("systemInstruction")) * config.prefill_ms_per_token / 1000
+        if random.random() < config.slow_rate:
+            latency *= config.slow_factor
+        time.sleep(max(0.0, latency))
+
+        if random.random() < config.error_rate:
+            self._send_error(503, "Stub overloaded", "UNAVAILABLE")
+            return
+
+        text = config.reply or REPLY
+        if match.group(2) == "generateContent":
+            self._send_json(200, self._response(text, body, cached_tokens))
+            return
+
+        # streamGenerateContent?alt=sse - one event per sentence
+        chunks = [chunk + " " for chunk in re.split(r"(?<=[.!?])\s+", text)]
+        payload = b"".join(
+            f"data: {json.dumps(self._response(chunk, body, cached_tokens))}\r\n\r\n".encode() for chunk in chunks
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_PATCH(self):
+        body = self._read_json()
+        name = self._cache_name()
+        cache = self._get_cache(name)
+        if cache is None:
+            self._send_error(404, "CachedContent not found", "NOT_FOUND")
+            return
+
+        cache["expires_at"] = time.monotonic() + _ttl_seconds(body.get("ttl"))
+        self._send_json(200, self._cache_resource(name, cache))
+
+    def do_GET(self):
+        # models.get - used as a cheap health probe
+        match = re.search(r"/models/([^/:?]+)$", self.path.split("?")[0])
+        if match:
+            self._send_json(200, {"name": f"models/{match.group(1)}", "displayName": match.group(1)})
+            return
+
+        name = self._cache_name()
+        cache = self._get_cache(name) if name else None
+        if cache is None:
+            self._send_error(404, "Not found", "NOT_FOUND")
+            return
+        self._send_json(200, self._cache_resource(name, cache))
+
+    def do_DELETE(self):
+        StubGeminiHandler.caches.pop(self._cache_name(), None)
+        self._send_json(200, {})
+
+    def _create_cache(self, body: dict):
+        name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+        if _tokens(body.get("systemInstruction")) + _tokens(body.get("contents")) < self.config.min_cache_tokens:
+            self._send_error(400, f"Cached content is too small. min_total_token_count is {self.config.min_cache_tokens}",
+                             "INVALID_ARGUMENT")
+            return
+
+        cache = {"body": body, "expires_at": time.monotonic() + _ttl_seconds(body.get("ttl"))}
+        StubGeminiHandler.caches[name] = cache
+        self._send_json(200, self._cache_resource(name, cache))
+
+    def _cache_name(self) -> str | None:
+        match = re.search(r"(cachedContents/[^/?]+)", self.path)
+        return match.group(1) if match else None
+
+    def _get_cache(self, name: str) -> dict | None:
+        cache = StubGeminiHandler.caches.get(name)
+        if cache is None or cache["expires_at"] < time.monotonic():
+            StubGeminiHandler.caches.pop(name, None)
+            return None
+        return cache
+
+    def _cache_resource(self, name: str, cache: dict) -> dict:
+        expire_time = time.time() + cache["expires_at"] - time.monotonic()
+        return {
+            "name": name,
+            "model": cache["body"].get("model"),
+            "displayName": cache["body"].get("displayName"),
+            "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(expire_time)),
+            "usageMetadata": {"totalTokenCount": _tokens(cache["body"].get("systemInstruction"))},
+        }
+
+    def _response(self, text: str, request: dict, cached_tokens: int = 0) -> dict:
+        prompt_tokens = _tokens(request.get("contents")) + _tokens(request.get("systemInstruction")) + cached_tokens
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "cachedContentTokenCount": cached_tokens,
+                "candidatesTokenCount": len(text) // 4,
+                "totalTokenCount": prompt_tokens + len(text) // 4,
+            },
+        }
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_error(self, code: int, message: str, status: str):
+        self._send_json(code, {"error": {"code": code, "message": message, "status": status}})
+
+    def _send_json(self, status: int, data: dict):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (timeout or a hedged request that lost the race)
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        if self.config.verbose:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=300, help="mean latency in ms")
+    parser.add_argument("--jitter", type=float, default=50, help="latency standard deviation in ms")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests made slow")
+    parser.add_argument("--slow-factor", type=float, default=10.0, help="latency multiplier for slow requests")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.2,
+                        help="extra latency per uncached system-instruction token")
+    parser.add_argument("--min-cache-tokens", type=int, default=0,
+                        help="reject context caches smaller than this, like the real minimum")
+    parser.add_argument("--reply", help="reply text (default: a canned rebuttal)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    StubGeminiHandler.config = args
+    server = ThreadingHTTPServer((args.host, args.port), StubGeminiHandler)
+    print(f"Stub Gemini on http://{args.host}:{args.port} "
+          f"(latency {args.latency:.0f}ms, slow {args.slow_rate:.0%}, errors {args.error_rate:.0%})")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {StubGeminiHandler.counter} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Turn LLM response caching on or off per topic, or list the current setting.
+
+Topics whose replies must always be fresh (e.g. ones built around current
+events) can opt out of the response cache; /query, /query/stream and
+/voice-turn then always call the model for them. The flag lives in the
+topics table, so a running server picks it up on the next request.
+
+Uses DB_PATH like the server (data.db by default).
+
+Usage (from the project root):
+    python scripts/topic_cache.py
+    python scripts/topic_cache.py climate_action off
+    python scripts/topic_cache.py climate_action on
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Modules import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("topic_id", nargs="?", help="topic to change; omit to list every topic")
+    parser.add_argument("state", nargs="?", choices=("on", "off"))
+    args = parser.parse_args()
+
+    if args.topic_id is not None and args.state is None:
+        parser.error("give on or off for the topic")
+
+    # Same schema migrations the server runs at startup (adds cache_enabled to older databases)
+    db.init_db()
+
+    if args.topic_id is not None:
+        if not db.set_topic_cache_enabled(args.topic_id, args.state == "on"):
+            parser.error(f"unknown topic: {args.topic_id}")
+        print(f"[CACHE] Response cache {args.state} for topic '{args.topic_id}'")
+        return
+
+    for topic in db.get_all_topics():
+        print(f"{topic['id']:<24} {'on' if topic['cache_enabled'] else 'off':<4} {topic['title']}")
+
+
+if __name__ == "__main__":
+    main()